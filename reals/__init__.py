@@ -1,189 +1,80 @@
 import fractions
 import decimal
+import functools
 import math
+import sys
 from .defs import EXPONENT_2, POWER_2, PRINT_HEX
 from .lft_one import LFTOne
 from .lft_two import LFTTwo
+from .lft_tensor import LFTTensor
+from .budget import BudgetExceeded, Budget, current_budget
+from .streams import *
+from .checkpoint import checkpoint, resume, CheckpointedDigits
+from .store import DigitStore, StoredDigits, checkpointed
+from . import bbp
+from .interval import float_bounds, compare, compare_within_budget, approximate
+from .sink import DigitSink, HexFormatter, DecimalFormatter, PackedFormatter, write_digits
+from .packed import pack_header, read_header, export_digits, PackedDigits
+from .scheduler import ScheduledDigits
+from .shared import SharedDigits, SharedDigitIterator
+from .remote import DigitServer, RemoteDigitIterator, RemoteStream
+from .newton import lower_exponent, ApproximationDigits, ReciprocalDigits, SqrtDigits
 
 
 def zero_stream():
-    while True:
-        yield 0
+    return ConstantDigits(0)
 
 
 def one_stream():
-    while True:
-        yield POWER_2 - 1
+    return ConstantDigits(POWER_2 - 1)
 
 
 def bbp_formula_base_2_32():
     """this calculates pi - 3 in base 16 via the BBP formula.
     We calculate pi - 3 instead of pi, so that the result is
     in the range of [-1, 1]"""
-    SHIFT = 4 * 14
-    M = 1 << SHIFT
-    MASK = M - 1
-
-    def S(j, n):
-        # Left sum
-        s = 0
-        k = 0
-        while k <= n:
-            r = 8 * k + j
-            s = (s + (pow(16, n - k, r) << SHIFT) // r) & MASK
-            k += 1
-        # fractional part
-        t = 0
-        k = -1
-        while 1:
-            # int(16**(n-k) * M)
-            xp = int(16 ** k * M)
-            newt = t + xp // (8 * (n - k) + j)
-            # Iterate until t no longer changes
-            if t == newt:
-                break
-            else:
-                t = newt
-            k -= 1
-        return s + t
-    n = 0
-    # not all of the last 6 digits are reliable, but the leading 8 are
-    EXT_SHIFT = 4 * 6
-    EXT_MASK = (1 << 4 * 8) - 1
-    while True:
-        x = ((4*S(1, n) - 2*S(4, n) - S(5, n) - S(6, n)) >> EXT_SHIFT) & EXT_MASK
-        yield x
-        n += 8
+    return BBPDigits()
 
 
 def convert_base(digitstream, orig_base, target_base):
-    def is_power2(n):
-        return not (n & (n - 1))
-
-    def exact_log2(n):
-        return n.bit_length() - 1
-
-    def is_exactly_convertible(bf, bt):
-        while bt > 1:
-            if bt % bf != 0:
-                return False
-            bt //= bf
-        return True
-
-    def discrete_log(bf, bt):
-        n = 0
-        while bt > 1:
-            bt //= bf
-            n += 1
-        return n
-
-    def largest_shared_power(bf, bt):
-        while bt > 1:
-            while bf % bt == 0:
-                bf //= bt
-            bf, bt = bt, bf
-        return bf
-
-    def get_split_strat():
-        # this is complicated by the fact that
-        # each digit can either be positive or
-        # negative! This leads us to the realization
-        # that there is no one unique sequence
-        # realizing the split but rather multiple
-        if is_power2(target_base):
-            mask = target_base - 1
-            shift = exact_log2(target_base)
-
-            def split_trgt_base(p, n):
-                split = - (-p >> (n * shift)) if p < 0 else p >> (n * shift)
-                rest = p - (split << (n * shift))
-                return rest, split
-        else:
-            def split_trgt_base(p, n):
-                base_pow = pow(target_base, n)
-                split = p // base_pow
-                if split < 0:
-                    split += 1
-                rest = p - split * base_pow
-                return rest, split
-        return split_trgt_base
-
-    digit_gen = digitstream()
-
-    if is_exactly_convertible(orig_base, target_base):
-        # original base is smaller, but fits exactly
-        in_digits_per_out = discrete_log(orig_base, target_base)
-        if is_power2(orig_base):
-            shift = exact_log2(orig_base)
-
-            def mult_orig_base(p):
-                return p << shift
-        else:
-            def mult_orig_base(p):
-                return p * orig_base
-        while True:
-            out = 0
-            for _ in range(in_digits_per_out):
-                out = mult_orig_base(out) + next(digit_gen)
-            yield out
-
-    elif is_exactly_convertible(target_base, orig_base):
-        # target base is smaller, but fits exactly
-        split_trgt_base = get_split_strat()
-        out_digits_per_in = discrete_log(target_base, orig_base)
-        while True:
-            digit = next(digit_gen)
-            for n in range(out_digits_per_in - 1, -1, -1):
-                digit, part = split_trgt_base(digit, n)
-                yield part
-    shared_power = largest_shared_power(target_base, orig_base)
-    if shared_power == 1:
-        raise NotImplementedError()
-    yield from convert_base(lambda: convert_base(digitstream, orig_base, shared_power), shared_power, target_base)
+    return ConvertBaseDigits(digitstream(), orig_base, target_base)
 
 
 def adapted_bpp_arbitrary_base():
-    yield from convert_base(bbp_formula_base_2_32, 2**32, POWER_2)
+    return convert_base(bbp_formula_base_2_32, 2**32, POWER_2)
 
 
-def transform_unary(lft, digitstream):
+def transform_unary(lft, digitstream, precision=None):
+    """with a precision, the transformed stream is cut off after that many digits,
+    in exchange the coefficients of the lft stay bounded"""
     assert lft.is_contracting
+    return functools.partial(UnaryTransformDigits, lft, digitstream, precision)
 
-    def transformed():
-        local_lft = lft.clone()
-        for digit in digitstream():
-            while local_lft.next_index_to_pull is None:
-                yield local_lft.extract()
-                local_lft.normalize()
-            local_lft.timesdigit(digit)
-    return transformed
 
+def transform_binary(lft, xstream, ystream, precision=None):
+    """with the same stream for x and y, every digit is pulled once and applied to both"""
+    assert lft.is_contracting
+    if xstream is ystream:
+        return functools.partial(SquareTransformDigits, lft, xstream, precision)
+    return functools.partial(BinaryTransformDigits, lft, xstream, ystream, precision)
 
-def transform_binary(lft, xstream, ystream):
+
+def transform_tensor(lft, digitstreams, precision=None):
+    """an LFTTensor applied to one digitstream per argument"""
     assert lft.is_contracting
+    return functools.partial(TensorTransformDigits, lft, tuple(digitstreams), precision)
 
-    def transformed():
-        local_lft = lft.clone()
-        xgen = xstream()
-        ygen = ystream()
-        while True:
-            next_pull = local_lft.next_index_to_pull
-            while next_pull is None:
-                yield local_lft.extract()
-                local_lft.normalize()
-                next_pull = local_lft.next_index_to_pull
-            if next_pull == 0:
-                pulled_x = next(xgen)
-                local_lft.timesDigitX(pulled_x)
-            else:
-                pulled_y = next(ygen)
-                local_lft.timesDigitY(pulled_y)
-    return transformed
+
+# fractions with longer digit expansions are calculated instead of stored
+MAX_PERIODIC_DIGITS = 4096
 
 
 def prim_from_fraction(frac):
     if not abs(frac) <= 1:
         raise ValueError("fraction must be in the interval [-1, 1]")
+    digits = PeriodicDigits.from_fraction(frac, MAX_PERIODIC_DIGITS)
+    if digits is not None:
+        return functools.partial(PeriodicDigits, digits.prefix, digits.cycle)
     return transform_unary(LFTOne.from_fraction(frac), one_stream)
 
 
@@ -193,15 +84,19 @@ def format_num(digitstream, integer_digits, precision=128):
 
     base = POWER_2
     precision //= EXPONENT_2
-    digit_gen = digitstream()
+    # all the digits needed are known up front, fetch them in one go. If the budget runs
+    # out before, the interval of the digits fetched so far is the answer
+    digits = take_within_budget(digitstream(), integer_digits + precision)
+    if len(digits) < integer_digits:
+        raise BudgetExceeded("the integer digits are not known within the budget")
+    digit_gen = iter(digits)
     integer_part = 0
     for _ in range(integer_digits):
         integer_part *= base
         integer_part += next(digit_gen)
 
     matrix = LFTOne(1, 0, integer_part, 1)
-    for _ in range(precision):
-        digit = next(digit_gen)
+    for digit in digit_gen:
         matrix.timesdigitbase(digit, base)
         matrix.normalize()
     lower, upper = matrix.bounds
@@ -256,8 +151,19 @@ def gen_format_hex(digitstream):
 
 
 def format_hex(digitstream, precision=2048):
-    generator = gen_format_hex(digitstream)
-    outstr = generator.send(None)
+    # one hex digit is 4 bits, plus the digit used for rounding
+    count = -(-4 * (precision + 1) // EXPONENT_2) + 1
+    source = digitstream()
+    fetched = take_within_budget(source, count)
+    if len(fetched) < count:
+        # the budget ran out, write as many hex digits as the digits fetched so far determine
+        precision = (len(fetched) - 1) * EXPONENT_2 // 4 - 1
+        if precision < 0:
+            raise BudgetExceeded("no digits known within the budget")
+
+    generator = gen_format_hex(lambda: PrefetchedDigits(source, fetched))
+    # the first message is None if the expansion starts with a zero
+    outstr = generator.send(None) or ""
     while precision > 0:
         result = generator.send(True)
         if result is not None:
@@ -268,24 +174,12 @@ def format_hex(digitstream, precision=2048):
     return outstr
 
 
-def stream_hex(digitstream):
-    line_buffer = ""
-
-    def print_chunk(chunk):
-        nonlocal line_buffer
-        line_buffer += chunk
-        as_chunks = [line_buffer[i:i + 64] for i in range(0, len(line_buffer), 64)]
-        line_buffer = "" if not as_chunks else as_chunks.pop(-1)
-        for to_print in as_chunks:
-            print(to_print)
-
-    generator = gen_format_hex(digitstream)
-    chunk = generator.send(None)
-    print(chunk)
-    while True:
-        result = generator.send(True)
-        if result is not None:
-            print_chunk(result)
+def stream_hex(digitstream, out=None):
+    if out is None:
+        sys.stdout.flush()
+        out = sys.stdout.buffer
+    exponent = EXPONENT_2 if EXPONENT_2 % 4 == 0 else 4
+    write_digits(digitstream, DigitSink(out, max_delay=0.1), HexFormatter(exponent), block=16)
 
 
 def dec_from_frac(frac):
@@ -293,16 +187,7 @@ def dec_from_frac(frac):
 
 
 def from_matrix_prod(lft_start, matrix_gen):
-    def generator():
-        lft = lft_start.clone()
-        matrices = matrix_gen()
-        while True:
-            while not lft.is_contracting or lft.next_index_to_pull is not None:
-                lft.times(next(matrices))
-            while lft.is_contracting and lft.next_index_to_pull is None:
-                yield lft.extract()
-            lft.normalize()
-    return generator
+    return functools.partial(MatrixProductDigits, lft_start, matrix_gen)
 
 
 def from_matrix2_prod(lft_start, lft_gen):
@@ -310,17 +195,47 @@ def from_matrix2_prod(lft_start, lft_gen):
 
 
 def log2_matrix_gen():
-    n = 1
-    while True:
-        yield LFTOne(- n, 2 * n + 1, -4 * n, 7 * n + 3)
-        n += 1
+    return Log2Matrices()
 
 log2_gen = from_matrix_prod(LFTOne(1, 2, 4, 6), log2_matrix_gen)
 
+# well-known constants, by the name they are stored under in a DigitStore
+constants = {
+    "pi_minus_three": adapted_bpp_arbitrary_base,
+    "log2": log2_gen,
+}
+
+
+def stored_constant(store, name):
+    return PrimRealNumber(store.stream(name, constants[name]))
+
+
+def remote_constant(address, name):
+    """a number whose digits are computed by a DigitServer on address, see serve in the
+    command line interface"""
+    return PrimRealNumber(RemoteStream(address, name))
+
+
+def from_packed(source):
+    """a number from the digits of a packed file (given by its path) or buffer.
+    The digits are read in place, the number ends after the last of them"""
+    if isinstance(source, str):
+        packed = PackedDigits.open(source)
+    else:
+        packed = PackedDigits(source)
+    return PrimRealNumber(packed)
+
 
 class PrimRealNumber():
-    def __init__(self, generator):
+    def __init__(self, generator, lft=None, operands=()):
+        if generator is None:
+            # evaluate the whole expression from one loop, instead of nesting generators
+            assert lft.is_contracting
+            generator = functools.partial(ScheduledDigits, self)
         self._generator = generator
+        # the expression the number was built from, if any
+        self._lft = lft
+        self._operands = operands
 
     def __str__(self):
         if PRINT_HEX:
@@ -330,14 +245,55 @@ class PrimRealNumber():
     def stream_to_stdout(self):
         return stream_hex(self._generator)
 
+    def stream_to(self, out, formatter=None, count=None):
+        """writes the digits to a binary file object or file descriptor, by default in hex"""
+        if formatter is None:
+            formatter = HexFormatter(EXPONENT_2 if EXPONENT_2 % 4 == 0 else 4)
+        with DigitSink(out) as sink:
+            write_digits(self._generator, sink, formatter, count)
+        return sink
+
+    def export(self, out, count, source=""):
+        """writes count digits in the packed binary format to a path, binary file object or
+        file descriptor. source is a free form description stored in the header"""
+        return export_digits(self._generator, out, count, source)
+
+    def checkpointed(self, path, interval=1024):
+        """a number with the same digits, whose digits and evaluation state are saved to
+        path every interval digits. Readers, also those of later runs, read the saved
+        digits first and continue the evaluation from there"""
+        return PrimRealNumber(checkpointed(self._generator, path, interval))
+
+    def bounded(self, precision):
+        """a number with the first precision digits of this one, which ends there. In exchange
+        the coefficients of its lfts stay as small as the remaining digits allow, instead of
+        growing with every digit. See ScheduledDigits"""
+        return PrimRealNumber(functools.partial(ScheduledDigits, self, precision))
+
+    def shared(self):
+        """a number with the same digits that can be read from many threads at once.
+        Every digit is computed once, however many readers there are"""
+        return PrimRealNumber(SharedDigits(self._generator))
+
+    def compare(self, other):
+        return compare(self, other)
+
+    def __lt__(self, other):
+        return compare(self, other) < 0
+
+    def __gt__(self, other):
+        return compare(self, other) > 0
+
+    def approximate(self, bits=24):
+        return approximate(self, bits)
+
 
 class PrimUnaryOperation():
     def __init__(self, lft):
         self._matrix = lft
 
     def __call__(self, number):
-        new_gen = transform_unary(self._matrix, number._generator)
-        return PrimRealNumber(new_gen)
+        return PrimRealNumber(None, self._matrix, (number,))
 
 
 class PrimBinaryOperation():
@@ -345,5 +301,170 @@ class PrimBinaryOperation():
         self._matrix = lft
 
     def __call__(self, x, y):
-        new_gen = transform_binary(self._matrix, x._generator, y._generator)
-        return PrimRealNumber(new_gen)
+        return PrimRealNumber(None, self._matrix, (x, y))
+
+
+class PrimTensorOperation():
+    def __init__(self, lft):
+        self._matrix = lft
+
+    def __call__(self, *numbers):
+        if len(numbers) != self._matrix.arity:
+            raise ValueError("the lft takes {} arguments, not {}".format(self._matrix.arity, len(numbers)))
+        return PrimRealNumber(None, self._matrix, numbers)
+
+
+def _uses(number):
+    """how often each subexpression of number is used in it, by id"""
+    uses = {id(number): 1}
+    stack = [number]
+    while stack:
+        current = stack.pop()
+        for operand in current._operands:
+            uses[id(operand)] = uses.get(id(operand), 0) + 1
+            if uses[id(operand)] == 1:
+                stack.append(operand)
+    return uses
+
+
+def _fuse(number, max_operands, uses, fused_nodes):
+    """the LFTTensor and operands of the expression number, with as many of its subexpressions
+    substituted into the tensor as max_operands allows. Subexpressions used more than once
+    are not substituted, they become nodes of their own, kept in fused_nodes by id"""
+    tensor, operands = LFTTensor.from_lft(number._lft), list(number._operands)
+    # substituting into the first argument moves the arguments it brings to the end
+    for _ in range(len(operands)):
+        operand = operands[0]
+        inner, inner_operands = LFTTensor(1, 0, 0, 1), [operand]
+        if operand._lft is not None and uses[id(operand)] > 1:
+            inner_operands = [_fused_node(operand, max_operands, uses, fused_nodes)]
+        elif operand._lft is not None:
+            fused, fused_operands = _fuse(operand, max_operands, uses, fused_nodes)
+            if len(operands) - 1 + len(fused_operands) <= max_operands:
+                inner, inner_operands = fused, fused_operands
+            else:
+                inner_operands = [PrimRealNumber(None, fused, tuple(fused_operands))]
+        tensor = tensor.substitute(inner, 0)
+        operands = operands[1:] + inner_operands
+    return tensor, operands
+
+
+def _fused_node(number, max_operands, uses, fused_nodes):
+    key = id(number)
+    if key not in fused_nodes:
+        tensor, operands = _fuse(number, max_operands, uses, fused_nodes)
+        fused_nodes[key] = PrimRealNumber(None, tensor, tuple(operands))
+    return fused_nodes[key]
+
+
+def fuse(number, max_operands=4):
+    """a number with the same value, whose expression has its unary and binary operations
+    merged into LFTTensor nodes of at most max_operands arguments. Every node absorbs the
+    digits of its operands directly, instead of through the digits of intermediate nodes.
+    A subexpression used more than once stays a node of its own, so it is evaluated once"""
+    if number._lft is None:
+        return number
+    return _fused_node(number, max_operands, _uses(number), {})
+
+
+def _exponent_of(frac):
+    """the smallest exponent with abs(frac) <= 2**exponent, for frac != 0"""
+    exponent = abs(frac).numerator.bit_length() - abs(frac).denominator.bit_length()
+    while abs(frac) > fractions.Fraction(2) ** exponent:
+        exponent += 1
+    while abs(frac) <= fractions.Fraction(2) ** (exponent - 1):
+        exponent -= 1
+    return exponent
+
+
+def _integer_coefficients(*coefficients):
+    denominator = math.lcm(*(fractions.Fraction(c).denominator for c in coefficients))
+    return [int(c * denominator) for c in coefficients]
+
+
+def _balanced(terms, combine):
+    """combines terms pairwise into a tree of depth log2(len(terms))"""
+    while len(terms) > 1:
+        paired = [combine(terms[i], terms[i + 1]) for i in range(0, len(terms) - 1, 2)]
+        if len(terms) % 2:
+            paired.append(terms[-1])
+        terms = paired
+    return terms[0]
+
+
+def _split_rationals(xs):
+    numbers, rationals = [], []
+    for x in xs:
+        if isinstance(x, PrimRealNumber):
+            numbers.append(x)
+        else:
+            rationals.append(fractions.Fraction(x))
+    return numbers, rationals
+
+
+def _add_scaled(x, y):
+    (x, ex), (y, ey) = x, y
+    # x * 2**ex + y * 2**ey = z * 2**e, and |z| <= 1 since both terms are at most 2**(e - 1)
+    e = max(ex, ey) + 1
+    low = min(ex, ey)
+    lft = LFTTwo(0, 0, 2 ** (ey - low), 0, 2 ** (ex - low), 0, 0, 2 ** (e - low))
+    return PrimBinaryOperation(lft)(x, y), e
+
+
+def sum_of(xs):
+    """returns (number, exponent) such that number * 2**exponent is the sum of xs.
+    xs are PrimRealNumbers and exact rationals. The rationals are added up exactly,
+    the numbers in a balanced tree of depth log2(len(xs))"""
+    numbers, rationals = _split_rationals(xs)
+    constant = sum(rationals, fractions.Fraction(0))
+    if not numbers:
+        if constant == 0:
+            return PrimRealNumber(zero_stream), 0
+        exponent = _exponent_of(constant)
+        return PrimRealNumber(prim_from_fraction(constant / fractions.Fraction(2) ** exponent)), exponent
+    number, exponent = _balanced([(x, 0) for x in numbers], _add_scaled)
+    if constant == 0:
+        return number, exponent
+    # x * 2**exponent + constant = z * 2**new_exponent with |z| <= 1
+    new_exponent = _exponent_of(fractions.Fraction(2) ** exponent + abs(constant))
+    scale = fractions.Fraction(2) ** new_exponent
+    a, c, d = _integer_coefficients(fractions.Fraction(2) ** exponent / scale, constant / scale, 1)
+    return PrimUnaryOperation(LFTOne(a, 0, c, d))(number), new_exponent
+
+
+def product_of(xs):
+    """returns (number, exponent) such that number * 2**exponent is the product of xs.
+    xs are PrimRealNumbers and exact rationals. The rationals are multiplied exactly,
+    the numbers in a balanced tree of depth log2(len(xs))"""
+    numbers, rationals = _split_rationals(xs)
+    constant = math.prod(rationals, start=fractions.Fraction(1))
+    if constant == 0:
+        return PrimRealNumber(zero_stream), 0
+    exponent = _exponent_of(constant)
+    scale = constant / fractions.Fraction(2) ** exponent
+    if not numbers:
+        return PrimRealNumber(prim_from_fraction(scale)), exponent
+    multiply = PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1))
+    number = _balanced(numbers, multiply)
+    if scale != 1:
+        number = PrimUnaryOperation(LFTOne.from_fraction(scale))(number)
+    return number, exponent
+
+
+def reciprocal(x):
+    """returns (number, exponent) such that number * 2**exponent is 1 / x. The digits are
+    computed by Newton's iteration on prefixes of x. Does not terminate if x is 0"""
+    exponent = lower_exponent(x._generator())
+    return PrimRealNumber(functools.partial(ReciprocalDigits, x._generator, exponent)), exponent
+
+
+def divide(x, y):
+    """returns (number, exponent) such that number * 2**exponent is x / y"""
+    number, exponent = reciprocal(y)
+    return PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1))(x, number), exponent
+
+
+def sqrt(x):
+    """the square root of x, which must not be negative. The digits are computed by
+    Newton's iteration on prefixes of x"""
+    return PrimRealNumber(functools.partial(SqrtDigits, x._generator))
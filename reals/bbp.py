@@ -0,0 +1,92 @@
+"""Digit extraction for pi - 3 via the BBP formula. Every block of hex digits can be
+calculated independently of all the digits before it"""
+import concurrent.futures
+from .defs import EXPONENT_2
+
+
+def bbp_series(j, n, shift):
+    """the fractional part of 16**n * sum_k 1 / (16**k * (8k + j)), as a fixed point number
+    with shift bits. Every term is rounded down, so the result is too small by less than
+    n + 2 + shift // 4 units"""
+    M = 1 << shift
+    MASK = M - 1
+    # Left sum
+    s = 0
+    k = 0
+    while k <= n:
+        r = 8 * k + j
+        s = (s + (pow(16, n - k, r) << shift) // r) & MASK
+        k += 1
+    # fractional part
+    t = 0
+    k = -1
+    while 1:
+        # int(16**(n-k) * M)
+        xp = M >> (-4 * k)
+        newt = t + xp // (8 * (n - k) + j)
+        # Iterate until t no longer changes
+        if t == newt:
+            break
+        else:
+            t = newt
+        k -= 1
+    return s + t
+
+
+def hex_digits(n, count=8):
+    """returns the hex digits n + 1, ..., n + count after the point of pi - 3 as one integer.
+    The series are evaluated with additional guard digits. Should the guard digits be too
+    close to a carry into the block to decide it, they are doubled until they are not"""
+    guard = 4 * 6
+    S = bbp_series
+    while True:
+        shift = 4 * count + guard
+        x = (4*S(1, n, shift) - 2*S(4, n, shift) - S(5, n, shift) - S(6, n, shift)) & ((1 << shift) - 1)
+        # each of the 4 series is off by less than this, and they are weighted by at most 4
+        error = 4 * (n + 2 + shift // 4)
+        low = x & ((1 << guard) - 1)
+        if error <= low < (1 << guard) - error:
+            return x >> guard
+        guard *= 2
+
+
+def _hex_block(args):
+    n, count = args
+    return hex_digits(n, count)
+
+
+def digits_range(start, count, exponent=EXPONENT_2, workers=None, block=64):
+    """returns the digits start, ..., start + count - 1 of pi - 3 in base 2**exponent,
+    as produced by adapted_bpp_arbitrary_base when exponent == EXPONENT_2.
+    The hex digits are calculated in independent blocks of block digits, in parallel
+    over workers processes if workers is given"""
+    if start < 0 or count < 0:
+        raise ValueError("digit positions must not be negative")
+    if count == 0:
+        return []
+    # the digits are all non-negative, so converting the base only regroups the bits
+    first_bit = exponent * start
+    end_bit = exponent * (start + count)
+    first_hex = first_bit // 4
+    end_hex = -(-end_bit // 4)
+    blocks = [(n, min(block, end_hex - n)) for n in range(first_hex, end_hex, block)]
+    if workers is None or workers <= 1 or len(blocks) == 1:
+        values = map(_hex_block, blocks)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        with executor:
+            values = list(executor.map(_hex_block, blocks))
+    bits = 0
+    for (_, length), value in zip(blocks, values):
+        bits = (bits << (4 * length)) | value
+    bits >>= 4 * end_hex - end_bit
+    mask = (1 << exponent) - 1
+    return [(bits >> (exponent * (count - 1 - i))) & mask for i in range(count)]
+
+
+def digit_at(n, exponent=EXPONENT_2):
+    """returns the digit n of pi - 3 in base 2**exponent, without calculating any digits before it"""
+    return digits_range(n, 1, exponent)[0]
+
+
+__all__ = ["bbp_series", "hex_digits", "digits_range", "digit_at"]
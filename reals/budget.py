@@ -0,0 +1,63 @@
+"""Limits on evaluations. Inside `with Budget(...):` the evaluation loops count the operand
+digits they pull and raise BudgetExceeded once a limit is reached, instead of going on
+for as long as the digits take. The queries built on them (format_num, format_hex,
+approximate) answer with what is known by then. compare raises, with the intervals known
+as the bounds of the BudgetExceeded, compare_within_budget returns them"""
+import contextvars
+import time
+
+_current = contextvars.ContextVar("reals_budget", default=None)
+
+# the evaluation loops report their pulls in chunks of this many
+CHECK_INTERVAL = 64
+
+
+class BudgetExceeded(Exception):
+    """raised when an evaluation runs out of its budget. The digit iterator that raised it
+    can be continued later, under a new budget. bounds holds enclosing intervals, for the
+    queries that know them"""
+
+    def __init__(self, message, bounds=None):
+        super().__init__(message)
+        self.bounds = bounds
+
+
+class Budget():
+    """at most pulls operand digits pulled, at most bits bits in the coefficients of an lft,
+    and no evaluation after timeout seconds from now. Any of them can be None, for no limit.
+    A budget applies to the evaluations in its with block, and in that thread only"""
+
+    def __init__(self, pulls=None, bits=None, timeout=None):
+        self.pulls = pulls
+        self.bits = bits
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.pulled = 0
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._tokens.pop())
+
+    def spend(self, pulls, lft=None):
+        """accounts for pulls operand digits absorbed into lft, raises BudgetExceeded if
+        that is beyond the budget"""
+        self.pulled += pulls
+        if self.pulls is not None and self.pulled > self.pulls:
+            raise BudgetExceeded("more than {} operand digits pulled".format(self.pulls))
+        if self.bits is not None and lft is not None:
+            bits = max(abs(coefficient) for coefficient in lft._matrix).bit_length()
+            if bits > self.bits:
+                raise BudgetExceeded("coefficients of {} bits, more than {}".format(bits, self.bits))
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded("deadline passed")
+
+
+def current_budget():
+    """the budget of the evaluations in the current context, or None"""
+    return _current.get()
+
+
+__all__ = ["CHECK_INTERVAL", "BudgetExceeded", "Budget", "current_budget"]
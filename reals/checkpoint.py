@@ -0,0 +1,46 @@
+import os
+import pickle
+from .streams import DigitIterator
+
+
+def checkpoint(digits, path):
+    """writes the complete state of a running digit iterator (including the
+    state of all its operands) to path. The file is replaced atomically, so an
+    interrupted write never destroys the previous checkpoint"""
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "wb") as f:
+        pickle.dump(digits, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def resume(path):
+    """restores a digit iterator written by checkpoint"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class CheckpointedDigits(DigitIterator):
+    """passes through the digits of source, writing a checkpoint of itself
+    every interval digits. position counts the digits handed out so far,
+    a resumed iterator continues with digit number position. See checkpointed
+    in store for numbers whose readers all start with the first digit"""
+
+    def __init__(self, source, path, interval):
+        if interval <= 0:
+            raise ValueError("checkpoint interval must be positive")
+        self.source = source
+        self.path = path
+        self.interval = interval
+        self.position = 0
+
+    def _next_digit(self):
+        digit = next(self.source)
+        self.position += 1
+        if self.position % self.interval == 0:
+            checkpoint(self, self.path)
+        return digit
+
+
+__all__ = ["checkpoint", "resume", "CheckpointedDigits"]
@@ -0,0 +1,360 @@
+"""The command line interface, see python -m reals --help"""
+import argparse
+import array
+import ast
+import fractions
+import functools
+import os
+import re
+import sys
+import time
+from . import *
+from .defs import EXPONENT_2, POWER_2
+from .store import digit_typecode
+
+pi_minus_three = PrimRealNumber(adapted_bpp_arbitrary_base)
+log2 = PrimRealNumber(log2_gen)
+
+# operations available in expressions. Every one of them maps [-1, 1] (or [-1, 1]^2) into itself
+operations = {
+    "neg": PrimUnaryOperation(LFTOne(-1, 0, 0, 1)),
+    "mul": PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1)),
+    "mid": PrimBinaryOperation(LFTTwo(0, 0, 1, 0, 1, 0, 0, 2)),
+    "recip2": PrimUnaryOperation(LFTOne(0, 1, 1, 2)),
+}
+
+# the expressions run by the benchmark subcommand
+workloads = {
+    "pi_minus_three": "pi_minus_three",
+    "log2": "log2",
+    "pi_squared": "mul(pi_minus_three, pi_minus_three)",
+    "pi_log2": "mid(pi_minus_three, neg(log2))",
+    "rational": "recip2(1/3)",
+}
+
+
+class UsageError(ValueError):
+    """an error in the command line arguments, reported with the usage"""
+
+
+@functools.lru_cache(maxsize=None)
+def _operations(centered):
+    """the operations, with lfts that extract centered digits if centered"""
+    if not centered:
+        return operations
+    centered_operations = {}
+    for name, operation in operations.items():
+        lft = operation._matrix.clone()
+        lft.centered = True
+        centered_operations[name] = type(operation)(lft)
+    return centered_operations
+
+
+def _scale(number, frac, centered):
+    if not abs(frac) <= 1:
+        raise UsageError("can only scale by factors in [-1, 1], not {}".format(frac))
+    return PrimUnaryOperation(LFTOne(frac.numerator, 0, 0, frac.denominator, centered))(number)
+
+
+def _fraction(node):
+    """the value of a numeric constant like 3, -1/4 or 0.5, or None"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return fractions.Fraction(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        inner = _fraction(node.operand)
+        return None if inner is None else -inner
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div):
+        num, den = _fraction(node.left), _fraction(node.right)
+        if num is not None and den:
+            return num / den
+    return None
+
+
+def _evaluate(node, centered):
+    operations = _operations(centered)
+    frac = _fraction(node)
+    if frac is not None:
+        return PrimRealNumber(prim_from_fraction(frac))
+    if isinstance(node, ast.Name):
+        if node.id in constants:
+            return PrimRealNumber(constants[node.id])
+        raise UsageError("unknown constant {}, known are {}".format(node.id, ", ".join(constants)))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return operations["neg"](_evaluate(node.operand, centered))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mult, ast.Div)):
+        if isinstance(node.op, ast.Mult) and _fraction(node.left) is not None:
+            node.left, node.right = node.right, node.left
+        factor = _fraction(node.right)
+        if factor is not None:
+            factor = factor if isinstance(node.op, ast.Mult) else 1 / factor
+            return _scale(_evaluate(node.left, centered), factor, centered)
+        if isinstance(node.op, ast.Mult):
+            return operations["mul"](_evaluate(node.left, centered), _evaluate(node.right, centered))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        operation = operations.get(node.func.id)
+        if operation is not None:
+            arity = 1 if isinstance(operation, PrimUnaryOperation) else 2
+            if len(node.args) != arity:
+                raise UsageError("{} takes {} arguments, not {}".format(node.func.id, arity, len(node.args)))
+            return operation(*(_evaluate(arg, centered) for arg in node.args))
+    raise UsageError("unsupported expression {}".format(ast.unparse(node)))
+
+
+def parse_expression(text, centered=False):
+    """a number from an expression over the constants, rational numbers in [-1, 1],
+    multiplication, scaling by rationals, negation and the calls in operations.
+    With centered, the operations extract the digits nearest to the middle of their intervals"""
+    try:
+        return _evaluate(ast.parse(text, mode="eval").body, centered)
+    except UsageError:
+        raise
+    except (ValueError, SyntaxError) as e:
+        # e.g. fractions out of [-1, 1] or calls with the wrong number of arguments
+        raise UsageError(str(e)) from e
+
+
+class ProgressDigits(DigitIterator):
+    """passes through the digits of source, reporting progress to out every interval seconds"""
+
+    def __init__(self, source, out=sys.stderr, interval=1.0):
+        self.source = source
+        self.out = out
+        self.interval = interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self.first_digit = None
+        self._reported = self.started
+
+    def _produced(self, count):
+        now = time.perf_counter()
+        if self.first_digit is None and count:
+            self.first_digit = now - self.started
+        self.count += count
+        if self.out is not None and now - self._reported >= self.interval:
+            self._reported = now
+            self.out.write("\r{} digits, {:.0f} digits/s".format(self.count, self.rate))
+            self.out.flush()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def __next__(self):
+        digit = next(self.source)
+        self._produced(1)
+        return digit
+
+    def take(self, count):
+        digits = []
+        if self.first_digit is None and count > 1:
+            # fetch the first digit on its own, to time it
+            digits = take(self.source, 1)
+            self._produced(len(digits))
+            count -= len(digits)
+        rest = take(self.source, count)
+        self._produced(len(rest))
+        return digits + rest
+
+    @property
+    def first_digit_text(self):
+        return "-" if self.first_digit is None else "{:.3f}s".format(self.first_digit)
+
+    def summary(self, written):
+        """the final report, for written output digits"""
+        elapsed = time.perf_counter() - self.started
+        rate = written / elapsed if elapsed > 0 else 0.0
+        return "{} digits in {:.3f}s, {:.0f} digits/s, first digit after {}".format(
+            written, elapsed, rate, self.first_digit_text)
+
+
+def _store_name(expression):
+    return re.sub(r"[^0-9A-Za-z]+", "_", expression).strip("_")
+
+
+def _digitstream(args, count):
+    """the digitstream to evaluate for the parsed arguments, count digits will be taken"""
+    expression = args.expression
+    if args.workers and (count is None or expression.strip() != "pi_minus_three"):
+        raise UsageError("--workers only applies to pi_minus_three with a number of digits")
+    if args.workers:
+        # the bbp digits can be computed in independent blocks
+        digits = bbp.digits_range(0, count + 1, EXPONENT_2, args.workers)
+        digitstream = functools.partial(iter, digits)
+    else:
+        digitstream = parse_expression(expression, args.centered)._generator
+    if args.store is not None:
+        store = DigitStore(args.store)
+        digitstream = store.stream(_store_name(expression), digitstream, args.checkpoint_interval)
+    return digitstream
+
+
+def _source_digits(args):
+    """the number of digits of base POWER_2 needed for args.digits output digits"""
+    if args.digits is None:
+        return None
+    return -(-args.digits * args.width // EXPONENT_2)
+
+
+def _open_output(path):
+    if path == "-":
+        sys.stdout.flush()
+        return sys.stdout.buffer, False
+    return open(path, "wb"), True
+
+
+def _progress(args):
+    count = _source_digits(args)
+    progress = ProgressDigits(None, sys.stderr if not args.quiet else None)
+    # one more digit than the output needs, for rounding the last one
+    progress.source = _digitstream(args, None if count is None else count + 1)()
+    return progress
+
+
+def _run(args, write):
+    """writes the digits of args.expression to args.output by write(digitstream, out),
+    which returns the sink and the number of digits written"""
+    progress = _progress(args)
+    out, close = _open_output(args.output)
+    try:
+        sink, written = write(lambda: progress, out)
+    finally:
+        if close:
+            out.close()
+    if not args.quiet:
+        sys.stderr.write("\r{}, {:.0f} bytes/s\n".format(progress.summary(written), sink.throughput))
+
+
+def compute(args):
+    if args.format == "hex":
+        formatter = HexFormatter(args.width)
+    elif args.format == "decimal":
+        formatter = DecimalFormatter(args.width)
+    else:
+        formatter = PackedFormatter(args.width)
+    trailer = b"" if args.format == "packed" else b"\n"
+
+    def write(digitstream, out):
+        with DigitSink(out) as sink:
+            written = write_digits(digitstream, sink, formatter, args.digits)
+            sink.write(trailer)
+        return sink, written
+    _run(args, write)
+
+
+def export(args):
+    def write(digitstream, out):
+        # the header counts the digits actually written, if the expression has fewer
+        source = args.source or args.expression
+        sink = export_digits(digitstream, out, args.digits, source, args.width)
+        itemsize = array.array(digit_typecode(args.width)).itemsize
+        return sink, (sink.bytes_written - len(pack_header(args.width, 0, source))) // itemsize
+    _run(args, write)
+
+
+def benchmark(args):
+    names = args.workloads or list(workloads)
+    for name in names:
+        if name not in workloads:
+            raise UsageError("unknown workload {}, known are {}".format(name, ", ".join(workloads)))
+        if args.workers and workloads[name] != "pi_minus_three":
+            raise UsageError("--workers only applies to the pi_minus_three workload, not {}".format(name))
+    print("{:<16} {:>10} {:>12} {:>14}".format("workload", "digits", "first digit", "digits/s"))
+    for name in names:
+        args.expression = workloads[name]
+        for _ in range(args.repeat):
+            progress = ProgressDigits(None, None)
+            progress.source = _digitstream(args, args.digits + 1)()
+            with open(os.devnull, "wb") as devnull, DigitSink(devnull) as sink:
+                written = write_digits(lambda: progress, sink, PackedFormatter(), args.digits)
+            elapsed = time.perf_counter() - progress.started
+            print("{:<16} {:>10} {:>12} {:>14.0f}".format(
+                name, written, progress.first_digit_text, written / elapsed if elapsed > 0 else 0.0))
+
+
+def _address(text):
+    """a (host, port) pair from host:port, or else the path of a unix socket"""
+    host, colon, port = text.rpartition(":")
+    if colon and port.isdigit():
+        return host or "localhost", int(port)
+    return text
+
+
+def serve(args):
+    server = DigitServer(_address(args.address), constants, args.batch)
+    if not args.quiet:
+        sys.stderr.write("serving {} on {}\n".format(", ".join(constants), server.address))
+    try:
+        server.serve_forever()
+    finally:
+        server.shutdown()
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python -m reals",
+                                     description="exact real arithmetic on digit streams")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=None,
+                        help="processes to compute the digits of pi_minus_three with")
+    common.add_argument("--width", type=int, default=EXPONENT_2,
+                        help="output digits are of base 2**WIDTH (default %(default)s)")
+    common.add_argument("--store", default=None,
+                        help="directory to read digits from and save computed digits to")
+    common.add_argument("--checkpoint-interval", type=int, default=1024,
+                        help="digits between saving the evaluation state to the store")
+    common.add_argument("--centered", action="store_true",
+                        help="let the operations of the expression extract the digits closest to the middle "
+                        "of their intervals, for lower latency")
+    common.add_argument("-q", "--quiet", action="store_true", help="do not report progress on stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compute_parser = commands.add_parser("compute", parents=[common],
+                                         help="write the digits of an expression")
+    compute_parser.add_argument("expression", help="a constant ({}) or an expression like "
+                                "'mul(pi_minus_three, log2) * 1/2'".format(", ".join(constants)))
+    compute_parser.add_argument("-n", "--digits", type=int, default=None,
+                                help="number of digits of base 2**WIDTH, forever if not given")
+    compute_parser.add_argument("-f", "--format", choices=["hex", "decimal", "packed"], default="hex")
+    compute_parser.add_argument("-o", "--output", default="-", help="file to write to (default stdout)")
+    compute_parser.set_defaults(run=compute)
+
+    export_parser = commands.add_parser("export", parents=[common],
+                                        help="write the digits of an expression in the packed binary format")
+    export_parser.add_argument("expression")
+    export_parser.add_argument("-n", "--digits", type=int, required=True)
+    export_parser.add_argument("-o", "--output", required=True)
+    export_parser.add_argument("--source", default=None, help="description stored in the header")
+    export_parser.set_defaults(run=export)
+
+    benchmark_parser = commands.add_parser("benchmark", parents=[common], help="time the benchmark workloads")
+    benchmark_parser.add_argument("workloads", nargs="*", help="workloads to run ({})".format(", ".join(workloads)))
+    benchmark_parser.add_argument("-n", "--digits", type=int, default=1000)
+    benchmark_parser.add_argument("--repeat", type=int, default=1)
+    benchmark_parser.set_defaults(run=benchmark)
+
+    serve_parser = commands.add_parser("serve", parents=[common],
+                                       help="serve the digits of the constants to remote_constant")
+    serve_parser.add_argument("address", help="host:port to listen on, or the path of a unix socket")
+    serve_parser.add_argument("--batch", type=int, default=256, help="digits sent per message")
+    serve_parser.set_defaults(run=serve)
+    return parser
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not 0 < args.width < 64:
+        parser.error("unsupported digit width {}".format(args.width))
+    try:
+        args.run(args)
+    except UsageError as e:
+        # other errors are failures of the evaluation, not of the arguments
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        return 0
+    return 0
+
+
+__all__ = ["UsageError", "parse_expression", "ProgressDigits", "main"]
@@ -1,3 +1,5 @@
 EXPONENT_2 = 32
 POWER_2 = 2 ** EXPONENT_2
 PRINT_HEX = False
+# extract the digit closest to the middle of the interval, instead of the one at its lower end
+CENTERED_DIGITS = False
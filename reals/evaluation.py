@@ -0,0 +1,101 @@
+"""The steps of evaluating an lft on the digits of its operands, shared by the transforms
+in streams and the scheduler"""
+import fractions
+import functools
+from .defs import EXPONENT_2
+from .lft_one import LFTOne
+
+
+def operand_digits_needed(lft, count):
+    # every absorbed operand digit shrinks the output interval by POWER_2,
+    # every extracted digit needs it to be at most 1 / POWER_2 long
+    return count + max(0, -(-lft.interval_length_bits // EXPONENT_2))
+
+
+def bound_coefficients(lft, remaining):
+    """rounds the coefficients of lft as far as still extracting remaining digits allows"""
+    # every extraction scales the error by POWER_2. An error of at most
+    # 2**-(EXPONENT_2 * (remaining + 1) + 2) leaves room for remaining extractions
+    if remaining <= 0:
+        return
+    tolerance_bits = EXPONENT_2 * (remaining + 1) + 2
+    # cheap check first, rounding would not be worth it anyway
+    if lft.min_denominator.bit_length() - tolerance_bits < 3 * EXPONENT_2:
+        return
+    slack = fractions.Fraction(1, 1 << tolerance_bits) - lft.error
+    if slack > 0:
+        # only use up half the slack, so that there is some left for the next rounding
+        lft.round_coefficients(slack / 2)
+
+
+class _CyclePowers():
+    """the matrices of 2**i repetitions of a cycle of digits, computed by repeated squaring"""
+
+    def __init__(self, cycle):
+        matrix = LFTOne(1, 0, 0, 1)
+        for digit in cycle:
+            matrix.timesdigit(digit)
+        self._powers = [matrix]
+
+    def __getitem__(self, i):
+        powers = self._powers
+        while len(powers) <= i:
+            square = powers[-1].clone()
+            square.times(powers[-1])
+            powers.append(square)
+        return powers[i]
+
+
+@functools.lru_cache(maxsize=64)
+def cycle_powers(cycle):
+    return _CyclePowers(cycle)
+
+
+# an lft that pulled this many digits in a row for one extraction is likely to need many
+# more. Only then (and after twice as many, ...) absorbing whole cycles is tried
+BURST = 8
+
+
+def is_burst(pulled):
+    return pulled >= BURST and pulled & (pulled - 1) == 0
+
+
+def absorb_cycles(lft, cycle, apply, pulling):
+    """absorbs as many whole repetitions of cycle into (a copy of) lft as pulling one digit
+    after another would, i.e. while pulling(lft) holds. Returns the new lft and the number
+    of repetitions absorbed. Only needs a logarithmic number of matrix products"""
+    powers = cycle_powers(cycle)
+    count, i = 0, 0
+    # find the first power that absorbs too much, then fill up with smaller ones
+    while True:
+        trial = lft.clone()
+        apply(trial, powers[i])
+        if not pulling(trial):
+            break
+        lft, count, i = trial, count + (1 << i), i + 1
+    for j in range(i - 1, -1, -1):
+        trial = lft.clone()
+        apply(trial, powers[j])
+        if pulling(trial):
+            lft, count = trial, count + (1 << j)
+    return lft, count
+
+
+def pulls_any(lft):
+    return lft.next_index_to_pull is not None
+
+
+def pulls_x(lft):
+    return lft.next_index_to_pull == 0
+
+
+def pulls_y(lft):
+    return lft.next_index_to_pull == 1
+
+
+def pulls_index(index, lft):
+    return lft.next_index_to_pull == index
+
+
+__all__ = ["operand_digits_needed", "bound_coefficients", "cycle_powers", "is_burst", "absorb_cycles",
+           "pulls_any", "pulls_x", "pulls_y", "pulls_index"]
@@ -0,0 +1,208 @@
+"""Cheap, outward rounded floating point enclosures of expressions. They are used to
+answer queries before falling back to calculating exact digits"""
+import fractions
+import math
+from .defs import POWER_2, EXPONENT_2
+from .budget import BudgetExceeded
+from .lft_one import LFTOne
+from .lft_two import LFTTwo
+from .lft_tensor import LFTTensor
+from .streams import take
+
+_INF = math.inf
+
+
+def _down(v):
+    return math.nextafter(v, -_INF)
+
+
+def _up(v):
+    return math.nextafter(v, _INF)
+
+
+def _coefficient(n):
+    # float() rounds to nearest, one step outwards in each direction contains n
+    v = float(n)
+    return (_down(v), _up(v))
+
+
+def _add(x, y):
+    return (_down(x[0] + y[0]), _up(x[1] + y[1]))
+
+
+def _mul(x, y):
+    products = (x[0] * y[0], x[0] * y[1], x[1] * y[0], x[1] * y[1])
+    return (_down(min(products)), _up(max(products)))
+
+
+def _div(x, y):
+    if y[0] <= 0 <= y[1]:
+        raise ZeroDivisionError()
+    quotients = (x[0] / y[0], x[0] / y[1], x[1] / y[0], x[1] / y[1])
+    return (_down(min(quotients)), _up(max(quotients)))
+
+
+def _hull(intervals):
+    return (min(i[0] for i in intervals), max(i[1] for i in intervals))
+
+
+def _clamp(x):
+    # every number we represent is in [-1, 1]
+    return (max(x[0], -1.0), min(x[1], 1.0))
+
+
+def _unary_image(lft, x):
+    a, b, c, d = (_coefficient(n) for n in lft._matrix)
+    # the lft is monotone, so the image is spanned by the values at the end points
+    values = []
+    for point in ((x[0], x[0]), (x[1], x[1])):
+        values.append(_div(_add(_mul(a, point), c), _add(_mul(b, point), d)))
+    return _hull(values)
+
+
+def _binary_image(lft, x, y):
+    a, b, c, d, e, f, g, h = (_coefficient(n) for n in lft._matrix)
+    # the lft is monotone in each argument, so the image is spanned by the corners
+    values = []
+    for px in ((x[0], x[0]), (x[1], x[1])):
+        for py in ((y[0], y[0]), (y[1], y[1])):
+            pxy = _mul(px, py)
+            # c and d are the coefficients of y, e and f those of x
+            num = _add(_add(_mul(a, pxy), _mul(c, py)), _add(_mul(e, px), g))
+            den = _add(_add(_mul(b, pxy), _mul(d, py)), _add(_mul(f, px), h))
+            values.append(_div(num, den))
+    return _hull(values)
+
+
+def _tensor_image(lft, boxes):
+    coefficients = [_coefficient(n) for n in lft._matrix]
+    numerator, denominator = coefficients[-2::-2], coefficients[::-2]
+    # the lft is monotone in each argument, so the image is spanned by the corners
+    values = []
+    for corner in range(1 << lft.arity):
+        points = [(box[1], box[1]) if corner >> i & 1 else (box[0], box[0]) for i, box in enumerate(boxes)]
+        num = den = (0.0, 0.0)
+        for mask in range(len(numerator)):
+            term = (1.0, 1.0)
+            for i, point in enumerate(points):
+                if mask >> i & 1:
+                    term = _mul(term, point)
+            num = _add(num, _mul(numerator[mask], term))
+            den = _add(den, _mul(denominator[mask], term))
+        values.append(_div(num, den))
+    return _hull(values)
+
+
+def _leaf_bounds(number):
+    digit = next(number._generator())
+    return _clamp(((digit - 1) / POWER_2, (digit + 1) / POWER_2))
+
+
+def float_bounds(number, _cache=None):
+    """returns floats (lower, upper) enclosing the number, calculated from the first digit
+    of every stream the expression is built from. Returns None if the coefficients
+    of the expression are out of range for floats"""
+    cache = {} if _cache is None else _cache
+    key = id(number)
+    if key in cache:
+        return cache[key]
+    lft, operands = number._lft, number._operands
+    try:
+        if lft is None:
+            result = _leaf_bounds(number)
+        else:
+            operand_bounds = [float_bounds(operand, cache) for operand in operands]
+            if any(bounds is None for bounds in operand_bounds):
+                result = None
+            elif isinstance(lft, LFTOne):
+                result = _clamp(_unary_image(lft, *operand_bounds))
+            elif isinstance(lft, LFTTwo):
+                result = _clamp(_binary_image(lft, *operand_bounds))
+            else:
+                assert isinstance(lft, LFTTensor)
+                result = _clamp(_tensor_image(lft, operand_bounds))
+    except (OverflowError, ZeroDivisionError, RecursionError, BudgetExceeded):
+        # too deep expressions are left to the digits as well
+        result = None
+    cache[key] = result
+    return result
+
+
+def _prefix_values(number, batch=4):
+    """yields (value, count), such that the number is within (value +- 1) / POWER_2**count"""
+    digits = number._generator()
+    value, count = 0, 0
+    while True:
+        fetched = take(digits, batch)
+        if len(fetched) < batch:
+            # a finite stream, its remaining digits do not narrow the interval any further
+            return
+        for digit in fetched:
+            value = (value << EXPONENT_2) + digit
+        count += batch
+        yield value, count
+        batch *= 2
+
+
+def _prefix_interval(value, count):
+    return fractions.Fraction(value - 1, POWER_2 ** count), fractions.Fraction(value + 1, POWER_2 ** count)
+
+
+def compare(x, y):
+    """returns -1 if x < y and 1 if x > y. Does not terminate for equal numbers, unless one
+    of them is finite or there is a Budget. When the budget runs out, it raises, like take,
+    there is no order to return. The BudgetExceeded raised holds the intervals of x and y
+    known by then as its bounds, see compare_within_budget"""
+    fx, fy = float_bounds(x), float_bounds(y)
+    if fx is not None and fy is not None:
+        if fx[1] < fy[0]:
+            return -1
+        if fy[1] < fx[0]:
+            return 1
+    bounds = (fx, fy)
+    try:
+        # both streams are consumed in the same batches, so the intervals have the same scale
+        for (vx, count), (vy, _) in zip(_prefix_values(x), _prefix_values(y)):
+            if vx + 1 < vy - 1:
+                return -1
+            if vy + 1 < vx - 1:
+                return 1
+            bounds = (_prefix_interval(vx, count), _prefix_interval(vy, count))
+    except BudgetExceeded as exceeded:
+        raise BudgetExceeded(str(exceeded), bounds) from exceeded
+    raise ValueError("the numbers can not be told apart within the digits available")
+
+
+def compare_within_budget(x, y):
+    """returns (order, bounds). order is -1 if x < y, 1 if x > y and None if the current
+    budget ran out before, then bounds are the intervals of x and y known by then (either
+    is None if nothing is known about it). bounds is None if the order is known"""
+    try:
+        return compare(x, y), None
+    except BudgetExceeded as exceeded:
+        return None, exceeded.bounds
+
+
+def approximate(number, bits=24):
+    """returns floats (lower, upper) enclosing the number, with upper - lower <= 2**-bits.
+    If the budget runs out before, the enclosure known by then is returned"""
+    if bits > 50:
+        raise ValueError("floats can not enclose numbers to more than 50 bits")
+    bounds = float_bounds(number)
+    if bounds is not None and bounds[1] - bounds[0] <= 2.0 ** -bits:
+        return bounds
+    best = (-1.0, 1.0) if bounds is None else bounds
+    try:
+        for value, count in _prefix_values(number, -(-(bits + 1) // EXPONENT_2)):
+            lower, upper = _prefix_interval(value, count)
+            bounds = _clamp((_down(float(lower)), _up(float(upper))))
+            if bounds[1] - bounds[0] <= 2.0 ** -bits:
+                return bounds
+            if bounds[1] - bounds[0] < best[1] - best[0]:
+                best = bounds
+    except BudgetExceeded:
+        return best
+    raise ValueError("not enough digits available for {} bits".format(bits))
+
+
+__all__ = ["float_bounds", "compare", "compare_within_budget", "approximate"]
@@ -1,6 +1,6 @@
 import fractions
 import math
-from .defs import POWER_2, EXPONENT_2
+from .defs import CENTERED_DIGITS, POWER_2, EXPONENT_2
 
 
 class LFTOne():
@@ -15,6 +15,11 @@ class LFTOne():
         # same sign <=> b**2 > a**2 <=> abs(b) > abs(a)
         return abs(b) > abs(a)
 
+    @staticmethod
+    def is_within_unit(num, den):
+        """Checks that num / den is in [-1, 1], for den != 0, without building a Fraction"""
+        return abs(num) <= abs(den)
+
     @staticmethod
     def digit_from_lower_bound(a, b):
         """returns a digit suitable for extraction (given the interval is small enough),
@@ -25,16 +30,51 @@ class LFTOne():
         # fall into the interval [num - 1, num + 1] / POWER_2
         # so we just need to pick the biggest num such that
         # (num - 1) // POWER_2 <= lowerBound
-        # EXCEPT that would result in num = POWER_2, in which case we return num - 1
-        # TODO: this is biased against negative numbers
-        # we might as well pick the smallest num such that
-        # upperBound <= num // POWER_2
-        # but alas, we would have to use a ceiling division there, so we dont
+        # EXCEPT that would result in num >= POWER_2 (for a lower bound of 1), in which case we return POWER_2 - 1
+        # this is biased against negative numbers, digit_from_midpoint is the unbiased choice
         num = 1 + (a << EXPONENT_2) // b
-        if num == POWER_2:
-            return num - 1
+        if num >= POWER_2:
+            return POWER_2 - 1
         return num
 
+    @staticmethod
+    def digit_from_midpoint(a, b, c, d):
+        """returns the digit closest to the middle a / b + c / d of the interval with lower
+        bound a / b and half length c / d. Unlike digit_from_lower_bound it leaves the same
+        room on both sides, so fewer operand digits are needed before the next extraction.
+        Widening the interval by an error on both ends does not move the middle"""
+        num = a * d + c * b
+        den = b * d
+        if den < 0:
+            num, den = -num, -den
+        # round to the nearest digit
+        num = ((num << (EXPONENT_2 + 1)) + den) // (2 * den)
+        return max(1 - POWER_2, min(POWER_2 - 1, num))
+
+    @staticmethod
+    def digit_from_widened_lower_bound(a, b, error):
+        """like digit_from_lower_bound, for the lower bound a / b - error.
+        The error is a Fraction with a power of 2 as denominator"""
+        exp = error.denominator.bit_length() - 1
+        num = LFTOne.digit_from_lower_bound((a << exp) - error.numerator * b, b << exp)
+        # the value itself is never below -1
+        return max(num, 1 - POWER_2)
+
+    @staticmethod
+    def is_small_enough_widened(a, b, error):
+        """like is_small_enough, for the interval widened by error on both ends"""
+        exp = error.denominator.bit_length() - 1
+        return ((a << exp) + error.numerator * b) << (EXPONENT_2 + 1) <= b << exp
+
+    @staticmethod
+    def floor_log2(frac):
+        """floor(log2(frac)) of a positive fraction"""
+        num, den = frac.numerator, frac.denominator
+        bits = num.bit_length() - den.bit_length()
+        if bits >= 0:
+            return bits if num >= den << bits else bits - 1
+        return bits if num << -bits >= den else bits - 1
+
     @staticmethod
     def is_small_enough(a, b):
         """returns if the interval length given by the fraction (2 * a) / b (must be positive)
@@ -55,13 +95,19 @@ class LFTOne():
     def from_fraction(cls, frac):
         return cls(frac.numerator, 0, 0, frac.denominator)
 
-    def __init__(self, a, b, c, d):
+    def __init__(self, a, b, c, d, centered=CENTERED_DIGITS):
         self._matrix = [a, b, c, d]
+        # extract the digit nearest to the middle of the interval, see digit_from_midpoint
+        self.centered = centered
+        # bound on how far the values are off after rounding coefficients, see round_coefficients
+        self._error = 0
         self._calculateCharacteristics()
 
     def clone(self):
         [a, b, c, d] = self._matrix
-        return LFTOne(a, b, c, d)
+        cloned = LFTOne(a, b, c, d, self.centered)
+        cloned._error = self._error
+        return cloned
 
     def __str__(self):
         [a, b, c, d] = self._matrix
@@ -165,17 +211,59 @@ class LFTOne():
         # L(1) - L(-1) = (c + a) / (d + b) - (c - a) / (d - b)
         #              = [(c + a) * (d - b) - (c - a) * (d + b)] / (d - b) * (d + b)
         #              = 2 * (a * d - c * b) / (d * d - b * b)
-        is_small_enough = LFTOne.is_small_enough(self._interval_length_num, self._interval_length_denom)
+        if self._error:
+            is_small_enough = LFTOne.is_small_enough_widened(
+                self._interval_length_num, self._interval_length_denom, self._error)
+        else:
+            is_small_enough = LFTOne.is_small_enough(self._interval_length_num, self._interval_length_denom)
         return None if is_small_enough else 0
 
     def extract(self):
         assert self.next_index_to_pull is None
-        extracted_digit = LFTOne.digit_from_lower_bound(self._lowest_bound_num, self._lowest_bound_denom)
+        if self.centered:
+            extracted_digit = LFTOne.digit_from_midpoint(self._lowest_bound_num, self._lowest_bound_denom,
+                                                         self._interval_length_num, self._interval_length_denom)
+            self._error *= POWER_2
+        elif self._error:
+            extracted_digit = LFTOne.digit_from_widened_lower_bound(
+                self._lowest_bound_num, self._lowest_bound_denom, self._error)
+            self._error *= POWER_2
+        else:
+            extracted_digit = LFTOne.digit_from_lower_bound(self._lowest_bound_num, self._lowest_bound_denom)
         assert -POWER_2 < extracted_digit < POWER_2
         self.invtimesdigit(extracted_digit)
         # assert self.is_contracting
         return extracted_digit
 
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def min_denominator(self):
+        """the minimum of abs(b * x + d) on [-1, 1], given the lft is bounded"""
+        [_a, b, _c, d] = self._matrix
+        return min(abs(d - b), abs(d + b))
+
+    def round_coefficients(self, max_error, min_shift=2 * EXPONENT_2):
+        """replaces the coefficients by smaller ones, if that is possible while changing
+        the values on [-1, 1] by at most max_error. Later extractions take the accumulated
+        error into account, so that extracted digits stay correct. Only shifts by at least
+        min_shift bits are worth it"""
+        [a, b, c, d] = self._matrix
+        # with coefficients off by less than 2**shift, numerator and denominator are off by
+        # less than 2 * 2**shift, which moves a value of absolute value at most 3 by less
+        # than 2**(shift + 3) / min_denominator <= 2**(shift + 4 - min_denominator.bit_length())
+        # we keep the error a power of two fraction, so that it is cheap to work with
+        error_bits = LFTOne.floor_log2(max_error)
+        shift = error_bits + self.min_denominator.bit_length() - 4
+        if shift < min_shift:
+            return
+        self._matrix[:] = [a >> shift, b >> shift, c >> shift, d >> shift]
+        self._error += fractions.Fraction(2) ** error_bits
+        assert self.is_bounded
+        self._calculateCharacteristics()
+
     @property
     def is_bounded(self):
         [_a, b, _c, d] = self._matrix
@@ -203,10 +291,15 @@ class LFTOne():
     def is_contracting(self):
         if not self.is_bounded:
             raise Exception("Not bounded, will never be contracting")
-        bm1, bp1 = self.bounds
-        if abs(bm1) <= 1 and abs(bp1) <= 1:
+        [a, b, c, d] = self._matrix
+        # the bounds are (c - a) / (d - b) and (c + a) / (d + b), compared as integers
+        num_m1, den_m1, num_p1, den_p1 = c - a, d - b, c + a, d + b
+        inside_m1 = LFTOne.is_within_unit(num_m1, den_m1)
+        inside_p1 = LFTOne.is_within_unit(num_p1, den_p1)
+        if inside_m1 and inside_p1:
             return True
-        if abs(bm1) > 1 and abs(bp1) > 1 and bm1 * bp1 > 0:
+        # both outside and of the same sign, the numerators are not 0 then
+        if not inside_m1 and not inside_p1 and ((num_m1 > 0) == (den_m1 > 0)) == ((num_p1 > 0) == (den_p1 > 0)):
             raise Exception("interval outside [-1, 1], will never be contracting")
         return False
 
@@ -214,4 +307,9 @@ class LFTOne():
     def interval_length(self):
         return 2 * fractions.Fraction(abs(self._determinant), self._signature)
 
+    @property
+    def interval_length_bits(self):
+        """approximately log2 of interval_length, cheap to calculate"""
+        return self._interval_length_num.bit_length() - self._interval_length_denom.bit_length() + 1
+
 __all__ = ["LFTOne"]
@@ -0,0 +1,250 @@
+import fractions
+import math
+from .defs import CENTERED_DIGITS, POWER_2, EXPONENT_2
+from .lft_one import LFTOne
+
+# the values at the corners are compared as fixed point numbers with this many bits after the point
+_PRECISION = 2 * EXPONENT_2
+
+
+def _corners(coefficients):
+    """the values of the multilinear polynomial with coefficients (by the mask of the variables
+    of each term) at the corners of [-1, 1]**k, by the mask of the variables that are 1 there.
+    Only needs additions, k rounds of the Walsh-Hadamard butterfly"""
+    values = list(coefficients)
+    bit = 1
+    while bit < len(values):
+        for j in range(len(values)):
+            if not j & bit:
+                u, v = values[j], values[j | bit]
+                values[j], values[j | bit] = u - v, u + v
+        bit <<= 1
+    return values
+
+
+class LFTTensor():
+    """a multilinear LFT of k arguments, the quotient of two polynomials in x_0, ..., x_k-1
+    that are linear in every argument. The coefficients are pairs of a numerator and a
+    denominator coefficient, for the terms by decreasing mask of their variables (bit i for
+    x_i), so for k = 1 and k = 2 they are the same as those of LFTOne and LFTTwo.
+    The lft is monotone in every argument while the denominator does not change sign, so
+    its bounds on [-1, 1]**k are the values at the corners. Rounding them to fixed point
+    numbers is cheaper than comparing them exactly, which would take two products of
+    coefficient sized numbers per corner. The bounds taken from them are slightly wider"""
+
+    def __init__(self, *coefficients, centered=CENTERED_DIGITS):
+        arity = (len(coefficients) // 2).bit_length() - 1
+        if arity < 1 or len(coefficients) != 2 << arity:
+            raise ValueError("an lft of k arguments has 2**(k+1) coefficients, not {}".format(len(coefficients)))
+        self.arity = arity
+        self._matrix = list(coefficients)
+        # extract the digit nearest to the middle of the interval, see LFTOne.digit_from_midpoint
+        self.centered = centered
+        # bound on how far the values are off after rounding coefficients, see round_coefficients
+        self._error = 0
+        self._calculateCharacteristics()
+
+    @classmethod
+    def from_lft(cls, lft):
+        """the LFTTensor of an LFTOne, LFTTwo or LFTTensor"""
+        tensor = cls(*lft._matrix, centered=lft.centered)
+        tensor._error = lft._error
+        return tensor
+
+    def clone(self):
+        cloned = LFTTensor(*self._matrix, centered=self.centered)
+        cloned._error = self._error
+        return cloned
+
+    def __str__(self):
+        return "[{}\n{}]".format("\t".join(str(n) for n in self._matrix[0::2]),
+                                 "\t".join(str(d) for d in self._matrix[1::2]))
+
+    @property
+    def _terms(self):
+        """the numerator and denominator coefficients, by the mask of the variables of their term"""
+        return self._matrix[-2::-2], self._matrix[::-2]
+
+    def _set_terms(self, numerator, denominator):
+        self._matrix[0::2] = numerator[::-1]
+        self._matrix[1::2] = denominator[::-1]
+        # TODO: inline
+        self._calculateCharacteristics()
+
+    def _calculateCharacteristics(self):
+        numerator, denominator = self._terms
+        nums, dens = _corners(numerator), _corners(denominator)
+        if dens[0] < 0:
+            nums = [-n for n in nums]
+            dens = [-d for d in dens]
+        self._corner_nums, self._corner_dens = nums, dens
+        self._bounded = all(d > 0 for d in dens)
+        if not self._bounded:
+            self._lowest_bound_num = self._lowest_bound_denom = None
+            self._interval_length_num = self._interval_length_denom = None
+            return
+        # rounded down, the quotients are small so the divisions are cheap
+        self._corner_values = values = [(n << _PRECISION) // d for n, d in zip(nums, dens)]
+        low, high = min(values), max(values) + 1
+        self._lowest_bound_num, self._lowest_bound_denom = low, 1 << _PRECISION
+        # the half length, as for LFTOne and LFTTwo
+        self._interval_length_num, self._interval_length_denom = high - low, 2 << _PRECISION
+
+    def timesDigit(self, digit, index):
+        # special cases times(LFTOne.digit(digit), index)
+        assert -POWER_2 < digit < POWER_2
+        numerator, denominator = self._terms
+        bit, exp = 1 << index, EXPONENT_2
+        for terms in (numerator, denominator):
+            for mask in range(len(terms)):
+                if not mask & bit:
+                    terms[mask] = (terms[mask] << exp) + digit * terms[mask | bit]
+        self._set_terms(numerator, denominator)
+
+    def times(self, other, index):
+        """substitutes the LFTOne other(x_index) for x_index"""
+        [a, b, c, d] = other._matrix
+        numerator, denominator = self._terms
+        bit = 1 << index
+        for terms in (numerator, denominator):
+            for mask in range(len(terms)):
+                if not mask & bit:
+                    linear, constant = terms[mask | bit], terms[mask]
+                    terms[mask | bit] = a * linear + b * constant
+                    terms[mask] = c * linear + d * constant
+        self._set_terms(numerator, denominator)
+
+    def invtimesdigit(self, digit):
+        # calculates inv(LFTOne.digit(digit)) * self
+        assert -POWER_2 < digit < POWER_2
+        numerator, denominator = self._terms
+        exp = EXPONENT_2
+        numerator = [(n << exp) - digit * d for n, d in zip(numerator, denominator)]
+        self._set_terms(numerator, denominator)
+
+    def substitute(self, other, index):
+        """the LFTTensor with the LFTTensor other substituted for x_index. Its arguments
+        are those of self without x_index, followed by those of other"""
+        assert not self._error and not other._error
+        numerator, denominator = self._terms
+        other_numerator, other_denominator = other._terms
+        bit = 1 << index
+        shift = self.arity - 1
+        size = 1 << (shift + other.arity)
+        result_numerator, result_denominator = [0] * size, [0] * size
+        for mask in range(len(numerator)):
+            if mask & bit:
+                continue
+            # drop bit index from the mask
+            low = mask & (bit - 1)
+            rest = low | ((mask >> 1) & ~(bit - 1))
+            for other_mask in range(len(other_numerator)):
+                target = rest | (other_mask << shift)
+                # (N1 x + N0) / (D1 x + D0) with x = P / Q is (N1 P + N0 Q) / (D1 P + D0 Q)
+                p, q = other_numerator[other_mask], other_denominator[other_mask]
+                result_numerator[target] = numerator[mask | bit] * p + numerator[mask] * q
+                result_denominator[target] = denominator[mask | bit] * p + denominator[mask] * q
+        result = LFTTensor(*[0] * (2 * size), centered=self.centered)
+        result._set_terms(result_numerator, result_denominator)
+        result.normalize()
+        return result
+
+    def normalize(self):
+        gcd = max(1, math.gcd(*self._matrix))
+        if gcd > 1:
+            self._matrix[:] = [coeff // gcd for coeff in self._matrix]
+            # TODO: inline
+            self._calculateCharacteristics()
+
+    @property
+    def next_index_to_pull(self):
+        # assert self.is_contracting
+        if self._error:
+            small_enough = LFTOne.is_small_enough_widened(
+                self._interval_length_num, self._interval_length_denom, self._error)
+        else:
+            small_enough = LFTOne.is_small_enough(self._interval_length_num, self._interval_length_denom)
+        if small_enough:
+            return None
+        return self._widest_index
+
+    @property
+    def _widest_index(self):
+        """the argument along which the values at the corners differ the most, approximately"""
+        values = self._corner_values
+        widest, widest_difference = 0, -1
+        for index in range(self.arity):
+            bit = 1 << index
+            for corner in range(len(values)):
+                if not corner & bit:
+                    difference = abs(values[corner | bit] - values[corner])
+                    if difference > widest_difference:
+                        widest, widest_difference = index, difference
+        return widest
+
+    def extract(self):
+        # assert self.is_contracting
+        if self.centered:
+            extracted_digit = LFTOne.digit_from_midpoint(self._lowest_bound_num, self._lowest_bound_denom,
+                                                         self._interval_length_num, self._interval_length_denom)
+            self._error *= POWER_2
+        elif self._error:
+            extracted_digit = LFTOne.digit_from_widened_lower_bound(
+                self._lowest_bound_num, self._lowest_bound_denom, self._error)
+            self._error *= POWER_2
+        else:
+            # the rounded lower bound can be a little below -1
+            extracted_digit = max(1 - POWER_2,
+                                  LFTOne.digit_from_lower_bound(self._lowest_bound_num, self._lowest_bound_denom))
+        assert -POWER_2 < extracted_digit < POWER_2
+        self.invtimesdigit(extracted_digit)
+        return extracted_digit
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def min_denominator(self):
+        """the minimum of abs(denominator) on [-1, 1]**k, given the lft is bounded"""
+        # the denominator is multilinear and does not change sign, its minimum is at a corner
+        return min(self._corner_dens)
+
+    def round_coefficients(self, max_error, min_shift=2 * EXPONENT_2):
+        """replaces the coefficients by smaller ones, if that is possible while changing
+        the values on [-1, 1]**k by at most max_error. See LFTOne.round_coefficients"""
+        # numerator and denominator are off by less than 2**k * 2**shift, which moves a value
+        # of absolute value at most 3 by less than 2**(shift + k + 2) / min_denominator
+        error_bits = LFTOne.floor_log2(max_error)
+        shift = error_bits + self.min_denominator.bit_length() - self.arity - 3
+        if shift < min_shift:
+            return
+        self._matrix[:] = [coeff >> shift for coeff in self._matrix]
+        self._error += fractions.Fraction(2) ** error_bits
+        self._calculateCharacteristics()
+        assert self.is_bounded
+
+    @property
+    def is_bounded(self):
+        return self._bounded
+
+    @property
+    def bounds(self):
+        """the lowest and highest value on [-1, 1]**k"""
+        assert self.is_bounded
+        values = [fractions.Fraction(n, d) for n, d in zip(self._corner_nums, self._corner_dens)]
+        return min(values), max(values)
+
+    @property
+    def is_contracting(self):
+        if not self.is_bounded:
+            return False
+        return all(LFTOne.is_within_unit(n, d) for n, d in zip(self._corner_nums, self._corner_dens))
+
+    @property
+    def interval_length_bits(self):
+        """approximately log2 of the length of the output interval, cheap to calculate"""
+        return self._interval_length_num.bit_length() - self._interval_length_denom.bit_length() + 1
+
+
+__all__ = ["LFTTensor"]
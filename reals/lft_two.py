@@ -1,6 +1,6 @@
 import fractions
 import math
-from .defs import POWER_2, EXPONENT_2
+from .defs import CENTERED_DIGITS, POWER_2, EXPONENT_2
 from .lft_one import LFTOne
 
 
@@ -19,13 +19,19 @@ class LFTTwo():
     MODE_PM_MM = 0x20
     MODE_PP_MM = 0x30
 
-    def __init__(self, a, b, c, d, e, f, g, h):
+    def __init__(self, a, b, c, d, e, f, g, h, centered=CENTERED_DIGITS):
         self._matrix = [a, b, c, d, e, f, g, h]
+        # extract the digit nearest to the middle of the interval, see LFTOne.digit_from_midpoint
+        self.centered = centered
+        # bound on how far the values are off after rounding coefficients, see round_coefficients
+        self._error = 0
         self._calculateCharacteristics()
 
     def clone(self):
         [a, b, c, d, e, f, g, h] = self._matrix
-        return LFTTwo(a, b, c, d, e, f, g, h)
+        cloned = LFTTwo(a, b, c, d, e, f, g, h, self.centered)
+        cloned._error = self._error
+        return cloned
 
     def __str__(self):
         [a, b, c, d, e, f, g, h] = self._matrix
@@ -121,6 +127,27 @@ class LFTTwo():
         # TODO: inline
         self._calculateCharacteristics()
 
+    def timesDigitXY(self, digit):
+        # timesDigitX(digit) followed by timesDigitY(digit), for the same number in both arguments
+        [a, b, c, d, e, f, g, h] = self._matrix
+        w, exp = digit, EXPONENT_2
+        c = a * w + (c << exp)
+        d = b * w + (d << exp)
+        g = e * w + (g << exp)
+        h = f * w + (h << exp)
+        self._matrix[2] = c
+        self._matrix[3] = d
+        self._matrix[4] = a * w + (e << exp)
+        self._matrix[5] = b * w + (f << exp)
+        self._matrix[6] = c * w + (g << exp)
+        self._matrix[7] = d * w + (h << exp)
+        self._calculateCharacteristics()
+
+    def timesXY(self, other):
+        # timesX(other) followed by timesY(other)
+        self.timesX(other)
+        self.timesY(other)
+
     def invtimes(self, other):
         # calculates inv(other) * self
         [a, b, c, d, e, f, g, h] = self._matrix
@@ -361,7 +388,11 @@ class LFTTwo():
         [a, b, c, d, e, f, g, h] = self._matrix
         # assert self.is_contracting
         # TODO: duplicated work here, when we also calculate this for lft_type
-        small_enough = LFTOne.is_small_enough(self._interval_length_num, self._interval_length_denom)
+        if self._error:
+            small_enough = LFTOne.is_small_enough_widened(
+                self._interval_length_num, self._interval_length_denom, self._error)
+        else:
+            small_enough = LFTOne.is_small_enough(self._interval_length_num, self._interval_length_denom)
         if small_enough:
             return None
         # TODO: find a solid way to determine which stream to pull next, instead of basically by chance
@@ -370,14 +401,59 @@ class LFTTwo():
 
     def extract(self):
         # assert self.is_contracting
-        # take the minimum point TODO: biased against smaller negative digits
-        extracted_digit = LFTOne.digit_from_lower_bound(self._lowest_bound_num, self._lowest_bound_denom)
+        # take the minimum point, or with centered the middle, which is not biased against negative digits
+        if self.centered:
+            extracted_digit = LFTOne.digit_from_midpoint(self._lowest_bound_num, self._lowest_bound_denom,
+                                                         self._interval_length_num, self._interval_length_denom)
+            self._error *= POWER_2
+        elif self._error:
+            extracted_digit = LFTOne.digit_from_widened_lower_bound(
+                self._lowest_bound_num, self._lowest_bound_denom, self._error)
+            self._error *= POWER_2
+        else:
+            extracted_digit = LFTOne.digit_from_lower_bound(self._lowest_bound_num, self._lowest_bound_denom)
         assert -POWER_2 < extracted_digit < POWER_2
         self.invtimesdigit(extracted_digit)
         return extracted_digit
 
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def min_denominator(self):
+        """the minimum of abs(b xy + d x + f y + h) on [-1, 1]**2, given the lft is bounded"""
+        [_a, b, _c, d, _e, f, _g, h] = self._matrix
+        # the denominator is bilinear and does not change sign, its minimum is at a corner
+        return min(abs(h - f - d + b), abs(h - f + d - b), abs(h + f - d - b), abs(h + f + d + b))
+
+    def round_coefficients(self, max_error, min_shift=2 * EXPONENT_2):
+        """replaces the coefficients by smaller ones, if that is possible while changing
+        the values on [-1, 1]**2 by at most max_error. See LFTOne.round_coefficients"""
+        # numerator and denominator are off by less than 4 * 2**shift, which moves a value
+        # of absolute value at most 3 by less than 2**(shift + 4) / min_denominator
+        error_bits = LFTOne.floor_log2(max_error)
+        shift = error_bits + self.min_denominator.bit_length() - 5
+        if shift < min_shift:
+            return
+        self._matrix[:] = [coeff >> shift for coeff in self._matrix]
+        self._error += fractions.Fraction(2) ** error_bits
+        assert self.is_bounded
+        self._calculateCharacteristics()
+
     @property
     def is_contracting(self):
-        return self.is_bounded and all(abs(bound) <= 1 for bound in self.bounds)
+        if not self.is_bounded:
+            return False
+        [a, b, c, d, e, f, g, h] = self._matrix
+        # the values at the corners, see bounds, compared as integers
+        within = LFTOne.is_within_unit
+        return (within(g - e - c + a, h - f - d + b) and within(g - e + c - a, h - f + d - b)
+                and within(g + e - c - a, h + f - d - b) and within(g + e + c + a, h + f + d + b))
+
+    @property
+    def interval_length_bits(self):
+        """approximately log2 of the length of the output interval, cheap to calculate"""
+        return self._interval_length_num.bit_length() - self._interval_length_denom.bit_length() + 1
 
 __all__ = ["LFTTwo"]
@@ -0,0 +1,187 @@
+"""Reciprocal and square root by Newton's iteration. Instead of absorbing one operand digit
+at a time, these work on prefixes of the operand: every round doubles the number of digits,
+and the result of the previous round is the starting point of the next one, so only a
+few Newton steps are needed per round"""
+import math
+from .defs import EXPONENT_2, POWER_2
+from .streams import DigitIterator, take
+
+# the first round produces this many digits, every later round doubles the count
+_FIRST_ROUND = 4
+
+
+class _Prefix():
+    """the value X / POWER_2**count of the first count digits of a digit iterator.
+    The number is within 1 / POWER_2**count of it"""
+
+    def __init__(self, digits):
+        self.digits = digits
+        self.value = 0
+        self.count = 0
+
+    def extend(self, count):
+        if count > self.count:
+            value = self.value
+            for digit in take(self.digits, count - self.count):
+                value = (value << EXPONENT_2) + digit
+            self.value = value
+            self.count = count
+        return self.value
+
+
+def lower_exponent(digits):
+    """the smallest m such that abs(number) >= 2**-m can be told from the digits.
+    Does not terminate if the number is 0"""
+    prefix = _Prefix(digits)
+    count = 1
+    while True:
+        value = prefix.extend(count)
+        lower = abs(value) - 1
+        if lower >= 1:
+            # abs(number) >= lower / POWER_2**count >= 2**(bit_length - 1 - EXPONENT_2 * count)
+            return EXPONENT_2 * count - lower.bit_length() + 1
+        count *= 2
+
+
+class ApproximationDigits(DigitIterator):
+    """digits of a number f, produced from approximations of it. approximate(bits) returns
+    an integer A with abs(f - A / 2**bits) <= 2**-bits. The digits are emitted in rounds,
+    every round at least doubles the precision of the previous one"""
+
+    def __init__(self):
+        self.emitted = 0
+        # the value of all digits produced so far is _value / POWER_2**emitted
+        self._value = 0
+        self._buffer = []
+        self._index = 0
+
+    def approximate(self, bits):
+        raise NotImplementedError()
+
+    def _round(self, count):
+        """produces the digits up to number count"""
+        emitted = self.emitted
+        length = count - emitted
+        # an error of 1/4 from the approximation, and 1/2 from rounding to count digits
+        approximation = self.approximate(EXPONENT_2 * count + 2)
+        value = (approximation + 2) >> 2
+        new = value - (self._value << (EXPONENT_2 * length))
+        # |f - digits so far| <= 1 / POWER_2**emitted always holds, so the new digits fit
+        # except right at the edge, where the largest digits are still correct
+        limit = (1 << (EXPONENT_2 * length)) - 1
+        new = max(-limit, min(limit, new))
+        sign = -1 if new < 0 else 1
+        magnitude = abs(new)
+        mask = POWER_2 - 1
+        self._buffer = self._buffer[self._index:] + [
+            sign * ((magnitude >> (EXPONENT_2 * (length - 1 - i))) & mask) for i in range(length)]
+        self._index = 0
+        self._value = (self._value << (EXPONENT_2 * length)) + new
+        self.emitted = count
+
+    def _fill(self, count):
+        buffered = len(self._buffer) - self._index
+        if buffered < count:
+            self._round(max(self.emitted + count - buffered, 2 * self.emitted, _FIRST_ROUND))
+
+    def __next__(self):
+        self._fill(1)
+        index = self._index
+        self._index = index + 1
+        return self._buffer[index]
+
+    def take(self, count):
+        self._fill(count)
+        index = self._index
+        self._index = index + count
+        return self._buffer[index:index + count]
+
+
+class ReciprocalDigits(ApproximationDigits):
+    """the digits of 1 / (x * 2**exponent), where abs(x) >= 2**-exponent"""
+
+    def __init__(self, xstream, exponent):
+        super().__init__()
+        self.x = _Prefix(xstream())
+        self.exponent = exponent
+        # the last approximation of the reciprocal, with _bits fractional bits
+        self._reciprocal = None
+        self._bits = 0
+
+    def approximate(self, bits):
+        # z = x * 2**exponent is needed to within 2**-(bits + 3), and abs(z) >= 1
+        exponent = self.exponent
+        count = -(-(bits + 3 + exponent) // EXPONENT_2)
+        x = self.x.extend(count)
+        F = bits + 4
+        z = (x << (exponent + F)) >> (EXPONENT_2 * self.x.count)
+        one = 1 << (2 * F)
+        if self._reciprocal is None:
+            r = one // z
+        else:
+            r = self._reciprocal << (F - self._bits)
+        # Newton's iteration r <- r * (2 - z * r), until abs(1 / z - r) <= 2**-(bits + 2)
+        while True:
+            residual = one - z * r
+            if abs(residual) <= 4 * abs(z):
+                break
+            r += (r * residual) >> (2 * F)
+        self._reciprocal, self._bits = r, F
+        return (r + (1 << (F - bits - 1))) >> (F - bits)
+
+
+def _isqrt(n, guess):
+    """floor(sqrt(n)), by a Newton step from guess. With a guess correct to half of the
+    bits, the correction residual / (2 * guess) has only half of the bits, and only that
+    many leading bits of the division are needed"""
+    if guess <= 0:
+        return math.isqrt(n)
+    residual = n - guess * guess
+    divisor = 2 * guess
+    correction_bits = abs(residual).bit_length() - divisor.bit_length()
+    shift = max(0, divisor.bit_length() - max(0, correction_bits) - 16)
+    root = guess + (residual >> shift) // max(1, divisor >> shift)
+    for _ in range(8):
+        square = root * root
+        if square > n:
+            root -= 1
+        elif square + 2 * root + 1 <= n:
+            root += 1
+        else:
+            return root
+    # the guess was too far off
+    return math.isqrt(n)
+
+
+class SqrtDigits(ApproximationDigits):
+    """the digits of sqrt(x), for x in [0, 1]"""
+
+    def __init__(self, xstream):
+        super().__init__()
+        self.x = _Prefix(xstream())
+        self._root = 0
+        self._bits = 0
+
+    def approximate(self, bits):
+        # for x far from 0 about bits digits of x are enough, close to 0 twice as many
+        count = -(-(bits + 2) // EXPONENT_2) + 1
+        max_count = -(-(2 * bits + 6) // EXPONENT_2)
+        guess = self._root << (bits - self._bits)
+        while True:
+            x = self.x.extend(max(count, self.x.count))
+            shift = EXPONENT_2 * self.x.count
+            if x + 1 < 0:
+                raise ValueError("square root of a negative number")
+            lower = max(0, x - 1)
+            upper = min(1 << shift, x + 1)
+            low = _isqrt((lower << (2 * bits)) >> shift, guess)
+            high = _isqrt(-((-upper << (2 * bits)) >> shift) - 1, low) + 1
+            if high - low <= 2 or count >= max_count:
+                break
+            count = min(2 * count, max_count)
+        root = low + (high - low) // 2
+        self._root, self._bits = root, bits
+        return root
+
+
+__all__ = ["lower_exponent", "ApproximationDigits", "ReciprocalDigits", "SqrtDigits"]
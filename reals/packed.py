@@ -0,0 +1,162 @@
+"""A packed binary format for digit streams. A file holds a small header followed by the
+digits as little endian signed integers, so that they can be mapped into memory and
+used directly, e.g. as a NumPy array, without creating a python object per digit"""
+import array
+import mmap
+import os
+import struct
+import sys
+from .defs import EXPONENT_2, POWER_2
+from .sink import DigitSink, PackedFormatter, write_digits
+from .store import digit_typecode
+from .streams import ConvertBaseDigits, DigitIterator
+
+MAGIC = b"REALDIGS"
+VERSION = 1
+# magic, version, digit exponent, digit size in bytes, length of the source, digit count
+_HEADER = struct.Struct("<8sBBHIQ")
+# the digits start at a multiple of this, so that they can be viewed without copying
+_ALIGNMENT = 8
+
+
+def _data_offset(source_length):
+    end = _HEADER.size + source_length
+    return -(-end // _ALIGNMENT) * _ALIGNMENT
+
+
+def pack_header(exponent, count, source=""):
+    """the header of a packed file holding count digits of base 2**exponent"""
+    typecode = digit_typecode(exponent)
+    source = source.encode("utf-8")
+    itemsize = array.array(typecode).itemsize
+    header = _HEADER.pack(MAGIC, VERSION, exponent, itemsize, len(source), count) + source
+    return header.ljust(_data_offset(len(source)), b"\0")
+
+
+def read_header(buffer):
+    """returns (exponent, count, source, offset) of the packed digits in buffer,
+    the digits start at byte offset"""
+    if len(buffer) < _HEADER.size:
+        raise ValueError("buffer is too short to hold packed digits")
+    magic, version, exponent, itemsize, source_length, count = _HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("buffer does not hold packed digits")
+    if version != VERSION:
+        raise ValueError("unsupported packed digits version {}".format(version))
+    if itemsize != array.array(digit_typecode(exponent)).itemsize:
+        raise ValueError("digits of base 2**{} are not {} bytes wide".format(exponent, itemsize))
+    source = bytes(buffer[_HEADER.size:_HEADER.size + source_length]).decode("utf-8")
+    offset = _data_offset(source_length)
+    if len(buffer) < offset + count * itemsize:
+        raise ValueError("buffer is truncated, expected {} digits".format(count))
+    return exponent, count, source, offset
+
+
+def export_digits(digitstream, out, count, source="", exponent=EXPONENT_2):
+    """writes the first count digits of digitstream in base 2**exponent, with a header,
+    to out (a path, binary file object or file descriptor). If the stream ends before,
+    the header is corrected to the digits written, which needs out to be seekable"""
+    if isinstance(out, str):
+        with open(out, "wb") as f:
+            return export_digits(digitstream, f, count, source, exponent)
+    with DigitSink(out) as sink:
+        sink.write(pack_header(exponent, count, source))
+        written = write_digits(digitstream, sink, PackedFormatter(exponent), count)
+    if written < count:
+        _rewrite_header(out, sink.bytes_written, pack_header(exponent, written, source))
+    return sink
+
+
+def _rewrite_header(out, size, header):
+    """overwrites the header at the start of the size bytes just written to out"""
+    try:
+        if isinstance(out, int):
+            end = os.lseek(out, 0, os.SEEK_CUR)
+            os.lseek(out, end - size, os.SEEK_SET)
+            os.write(out, header)
+            os.lseek(out, end, os.SEEK_SET)
+        else:
+            end = out.tell()
+            out.seek(end - size)
+            out.write(header)
+            out.seek(end)
+            out.flush()
+    except OSError as e:
+        raise ValueError("the stream ended early and the header of the output can not be corrected") from e
+
+
+class PackedDigits():
+    """the digits of a packed file or buffer, viewed in place. digits is a memoryview
+    (or, on big endian machines, a byte swapped copy) of count signed integers"""
+
+    def __init__(self, buffer, path=None):
+        self.path = path
+        self._buffer = buffer
+        self.exponent, self.count, self.source, self.offset = read_header(buffer)
+        typecode = digit_typecode(self.exponent)
+        end = self.offset + self.count * array.array(typecode).itemsize
+        data = memoryview(buffer)[self.offset:end]
+        if sys.byteorder == "little":
+            self.digits = data.cast(typecode)
+        else:
+            self.digits = array.array(typecode, data)
+            self.digits.byteswap()
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), path)
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        if self.path is None:
+            return {"buffer": bytes(self._buffer)}
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        if "path" in state:
+            with open(state["path"], "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.__init__(buffer, state["path"])
+        else:
+            self.__init__(state["buffer"])
+
+    def as_array(self):
+        """the digits as a NumPy array sharing the memory of the file"""
+        import numpy
+        dtype = numpy.dtype(digit_typecode(self.exponent)).newbyteorder("<")
+        return numpy.frombuffer(self._buffer, dtype, self.count, self.offset)
+
+    def __call__(self):
+        """a digit iterator over the packed digits, in base POWER_2"""
+        digits = PackedDigitIterator(self)
+        if self.exponent != EXPONENT_2:
+            return ConvertBaseDigits(digits, 2 ** self.exponent, POWER_2)
+        return digits
+
+
+class PackedDigitIterator(DigitIterator):
+    """iterates the digits of a PackedDigits. The packed digits are only a prefix of
+    the number, the iterator stops after the last of them"""
+
+    def __init__(self, packed):
+        self.packed = packed
+        self.position = 0
+
+    def __next__(self):
+        position = self.position
+        if position >= self.packed.count:
+            raise StopIteration()
+        self.position = position + 1
+        return self.packed.digits[position]
+
+    def take(self, count):
+        start = self.position
+        end = min(start + count, self.packed.count)
+        self.position = end
+        return self.packed.digits[start:end].tolist()
+
+
+__all__ = ["pack_header", "read_header", "export_digits", "PackedDigits", "PackedDigitIterator"]
@@ -0,0 +1,311 @@
+"""Digit streams served over a socket. A DigitServer hosts named digitstreams, usually on a
+dedicated process, and a RemoteStream reads one of them as an ordinary digitstream.
+
+Every message is a frame of a type byte and a payload length, followed by the payload.
+The client opens a stream at some position and grants the server credit for a number of
+digits. The server sends batches of packed digits until the credit is used up, so the
+client decides how far ahead of its demand the server computes"""
+import array
+import select
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from .defs import EXPONENT_2, POWER_2
+from .shared import SharedDigits
+from .store import digit_typecode
+from .streams import ConvertBaseDigits, DigitIterator, take
+
+# message type and payload length
+_FRAME = struct.Struct("<BI")
+_COUNT = struct.Struct("<Q")
+
+# client -> server: the position to start at, followed by the name of the stream
+OPEN = 1
+# server -> client: the exponent of the base of the digits
+READY = 2
+# client -> server: the number of further digits the server may send
+CREDIT = 3
+# server -> client: packed little endian digits
+DIGITS = 4
+# server -> client: the stream has no further digits
+END = 5
+# server -> client: a message why the stream can not be served
+ERROR = 6
+
+
+def _pack_digits(digits, exponent=EXPONENT_2):
+    packed = array.array(digit_typecode(exponent), digits)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_digits(payload, exponent):
+    digits = array.array(digit_typecode(exponent))
+    digits.frombytes(payload)
+    if sys.byteorder != "little":
+        digits.byteswap()
+    return digits.tolist()
+
+
+class _Connection():
+    """frames over a connected socket"""
+
+    def __init__(self, sock):
+        self.socket = sock
+
+    def send(self, kind, payload=b""):
+        self.socket.sendall(_FRAME.pack(kind, len(payload)) + payload)
+
+    def _receive_exactly(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.socket.recv(length - len(data))
+            if not chunk:
+                if data:
+                    raise ConnectionError("connection closed in the middle of a frame")
+                return None
+            data += chunk
+        return bytes(data)
+
+    def receive(self):
+        """the next (type, payload), or None if the connection was closed"""
+        header = self._receive_exactly(_FRAME.size)
+        if header is None:
+            return None
+        kind, length = _FRAME.unpack(header)
+        payload = self._receive_exactly(length) if length else b""
+        if payload is None:
+            raise ConnectionError("connection closed in the middle of a frame")
+        return kind, payload
+
+    def pending(self):
+        """if a frame can be received without waiting"""
+        return bool(select.select([self.socket], [], [], 0)[0])
+
+    def close(self):
+        self.socket.close()
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            self._serve(_Connection(self.request))
+        except ConnectionError:
+            # the client went away, there is nobody to tell
+            pass
+
+    def _serve(self, connection):
+        frame = connection.receive()
+        if frame is None or frame[0] != OPEN:
+            return
+        (start,) = _COUNT.unpack_from(frame[1])
+        name = frame[1][_COUNT.size:].decode("utf-8")
+        shared = self.server.digit_server.shared(name)
+        if shared is None:
+            connection.send(ERROR, "unknown stream {}".format(name).encode("utf-8"))
+            return
+        connection.send(READY, bytes([EXPONENT_2]))
+        digits = shared()
+        digits.skip(start)
+        batch = self.server.digit_server.batch
+        credit = 0
+        while True:
+            if credit == 0 or connection.pending():
+                frame = connection.receive()
+                if frame is None:
+                    return
+                kind, payload = frame
+                if kind == CREDIT:
+                    credit += _COUNT.unpack(payload)[0]
+                continue
+            count = min(credit, batch)
+            batch_digits = take(digits, count)
+            if batch_digits:
+                connection.send(DIGITS, _pack_digits(batch_digits))
+            credit -= len(batch_digits)
+            if len(batch_digits) < count:
+                connection.send(END)
+                return
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+class DigitServer():
+    """serves the digitstreams in streams (a dict by name) on address, a (host, port) pair
+    or the path of a unix socket. The digits of each stream are computed once and kept,
+    for all connections reading it. batch is the most digits sent in one frame"""
+
+    def __init__(self, address, streams, batch=256):
+        self.streams = dict(streams)
+        self.batch = batch
+        self._shared = {}
+        self._lock = threading.Lock()
+        if isinstance(address, str):
+            if _UnixServer is None:
+                raise ValueError("unix sockets are not supported on this platform")
+            self._server = _UnixServer(address, _StreamHandler)
+        else:
+            self._server = _TCPServer(address, _StreamHandler)
+        self._server.digit_server = self
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def shared(self, name):
+        """the cached digits of the stream name, or None if there is no such stream"""
+        with self._lock:
+            if name not in self._shared:
+                if name not in self.streams:
+                    return None
+                self._shared[name] = SharedDigits(self.streams[name])
+            return self._shared[name]
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """serves from a background thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class RemoteDigitIterator(DigitIterator):
+    """reads the digits of a stream hosted by a DigitServer, starting at position. The
+    server is granted credit for window batches beyond what has been asked for, so that it
+    computes ahead of demand. Pickling keeps the position, the copy opens a new connection"""
+
+    def __init__(self, address, name, position=0, batch=256, window=4):
+        self.address = address
+        self.name = name
+        self.position = position
+        self.batch = batch
+        self.window = window
+        self.exponent = None
+        self._connection = None
+        self._buffer = []
+        self._index = 0
+        # digits granted to the server, that have not arrived yet
+        self._outstanding = 0
+        self._finished = False
+
+    def __getstate__(self):
+        return {"address": self.address, "name": self.name, "position": self.position,
+                "batch": self.batch, "window": self.window}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.address)
+        else:
+            sock = socket.create_connection(self.address)
+        connection = _Connection(sock)
+        connection.send(OPEN, _COUNT.pack(self.position) + self.name.encode("utf-8"))
+        frame = connection.receive()
+        if frame is None:
+            raise ConnectionError("connection closed before the stream was opened")
+        kind, payload = frame
+        if kind == ERROR:
+            connection.close()
+            raise ValueError(payload.decode("utf-8"))
+        self.exponent = payload[0]
+        self._connection = connection
+        self._top_up(0)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _grant(self, count):
+        self._connection.send(CREDIT, _COUNT.pack(count))
+        self._outstanding += count
+
+    def _top_up(self, needed):
+        """grants credit so that needed digits plus window batches are on their way"""
+        deficit = needed + self.window * self.batch - (len(self._buffer) - self._index) - self._outstanding
+        if deficit > 0:
+            # in whole batches, so that a reader taking single digits does not grant each of them
+            self._grant(-(-deficit // self.batch) * self.batch)
+
+    def _receive(self):
+        frame = self._connection.receive()
+        if frame is None:
+            raise ConnectionError("the digit server closed the connection")
+        kind, payload = frame
+        if kind == DIGITS:
+            digits = _unpack_digits(payload, self.exponent)
+            self._buffer = self._buffer[self._index:] + digits
+            self._index = 0
+            self._outstanding -= len(digits)
+        elif kind == END:
+            self._finished = True
+        elif kind == ERROR:
+            raise ValueError(payload.decode("utf-8"))
+
+    def __next__(self):
+        digits = self.take(1)
+        if not digits:
+            raise StopIteration()
+        return digits[0]
+
+    def take(self, count):
+        if self._connection is None and not self._finished:
+            self.connect()
+        while len(self._buffer) - self._index < count and not self._finished:
+            self._top_up(count)
+            self._receive()
+        index = self._index
+        digits = self._buffer[index:index + count]
+        self._index = index + len(digits)
+        self.position += len(digits)
+        if not self._finished:
+            self._top_up(0)
+        return digits
+
+
+class RemoteStream():
+    """the digitstream of the stream name, hosted by a DigitServer on address"""
+
+    def __init__(self, address, name, batch=256, window=4):
+        self.address = address
+        self.name = name
+        self.batch = batch
+        self.window = window
+
+    def __call__(self):
+        digits = RemoteDigitIterator(self.address, self.name, 0, self.batch, self.window)
+        digits.connect()
+        if digits.exponent != EXPONENT_2:
+            return ConvertBaseDigits(digits, 2 ** digits.exponent, POWER_2)
+        return digits
+
+
+__all__ = ["DigitServer", "RemoteDigitIterator", "RemoteStream"]
@@ -0,0 +1,258 @@
+"""Evaluation of whole expressions from a single loop. Instead of every transform pulling
+from the generators of its operands, which nests one python frame per level of the
+expression, all nodes of the expression are kept in a flat list and an explicit stack
+of requests decides which node works next"""
+import functools
+from .budget import CHECK_INTERVAL, current_budget
+from .lft_one import LFTOne
+from .lft_two import LFTTwo
+from .lft_tensor import LFTTensor
+from .evaluation import absorb_cycles, bound_coefficients, is_burst, operand_digits_needed, pulls_any, pulls_index, \
+    pulls_x, pulls_y
+from .streams import DigitIterator, periodic, take
+
+# the digits of a node are dropped once all readers are past them and there are that many
+_TRIM_THRESHOLD = 4096
+
+# with a precision, operand nodes may produce this many digits (and an eighth of the
+# precision of their readers) more than their readers are likely to need
+_PRECISION_MARGIN = 16
+
+
+class _Node():
+    """one node of the expression, either a leaf reading from a digit iterator or an lft
+    absorbing the digits of its operand nodes. digits holds the produced digits starting
+    with digit number base, positions holds the next digit to read from each operand.
+    A node is exhausted once it can not produce any further digits, after a finite leaf or
+    once it produced precision digits. With a precision, the coefficients of the lft are
+    kept as small as the remaining digits allow, as in the transforms"""
+
+    def __init__(self, lft, operands, source, precision=None):
+        self.lft = None if lft is None else lft.clone()
+        self.operands = operands
+        # both arguments of a binary lft are the same node, its digits go to both at once
+        self.aliased = isinstance(lft, LFTTwo) and operands[0] is operands[1]
+        self.source = source
+        self.positions = [0] * len(operands)
+        # digits pulled from each operand since the last extraction
+        self.pulled = [0] * len(operands)
+        self.digits = []
+        self.base = 0
+        self.readers = []
+        self.exhausted = False
+        self.precision = precision
+
+    @property
+    def produced(self):
+        return self.base + len(self.digits)
+
+    def digit(self, position):
+        return self.digits[position - self.base]
+
+    def cycle_at(self, position):
+        return None
+
+    def trim(self, low):
+        if low - self.base >= _TRIM_THRESHOLD:
+            del self.digits[:low - self.base]
+            self.base = low
+
+
+class _PeriodicNode(_Node):
+    """a leaf whose digits are prefix followed by cycle repeated forever. Its digits are
+    calculated from the position, so readers can skip ahead without buffering anything"""
+
+    def __init__(self, prefix, cycle):
+        super().__init__(None, (), None)
+        self.prefix = prefix
+        self.cycle = cycle
+
+    @property
+    def produced(self):
+        return float("inf")
+
+    def digit(self, position):
+        if position < len(self.prefix):
+            return self.prefix[position]
+        return self.cycle[(position - len(self.prefix)) % len(self.cycle)]
+
+    def cycle_at(self, position):
+        """the cycle as it continues from position, if that is past the prefix"""
+        if position < len(self.prefix):
+            return None
+        phase = (position - len(self.prefix)) % len(self.cycle)
+        return self.cycle[phase:] + self.cycle[:phase]
+
+    def trim(self, low):
+        pass
+
+
+def _key(number):
+    # numbers with the same generator have the same digits, leaves are shared by that
+    return ("leaf", id(number._generator)) if number._lft is None else id(number)
+
+
+def _flatten(number):
+    """the nodes of the expression number, operands before the nodes using them.
+    A number used several times in the expression becomes a single node"""
+    nodes = {}
+    order = []
+    stack = [(number, False)]
+    while stack:
+        current, expanded = stack.pop()
+        key = _key(current)
+        if key in nodes:
+            continue
+        if current._lft is None:
+            source = current._generator()
+            tail = periodic(source)
+            nodes[key] = _Node(None, (), source) if tail is None else _PeriodicNode(*tail)
+            order.append(nodes[key])
+        elif expanded:
+            operands = tuple(nodes[_key(operand)] for operand in current._operands)
+            node = _Node(current._lft, operands, None)
+            for index, operand in enumerate(operands):
+                operand.readers.append((node, index))
+            nodes[key] = node
+            order.append(node)
+        else:
+            stack.append((current, True))
+            stack.extend((operand, False) for operand in current._operands if _key(operand) not in nodes)
+    return order
+
+
+def _limit(nodes, precision):
+    """gives the root of nodes precision, and every node with an lft a precision that
+    is likely enough for the digits its readers need"""
+    nodes[-1].precision = precision
+    # readers come after their operands
+    for node in reversed(nodes):
+        if node.lft is None:
+            continue
+        needed = operand_digits_needed(node.lft, node.precision) + node.precision // 8 + _PRECISION_MARGIN
+        for operand in node.operands:
+            if operand.lft is not None:
+                operand.precision = max(operand.precision or 0, needed)
+
+
+class ScheduledDigits(DigitIterator):
+    """the digits of an expression built from PrimRealNumbers, the same as the nested
+    transforms of the expression would produce. With a precision, only that many digits
+    are produced, but the coefficients of every lft are kept as small as that allows.
+    An operand that needs more digits than estimated ends the digits earlier"""
+
+    def __init__(self, number, precision=None):
+        self.nodes = _flatten(number)
+        self.root = self.nodes[-1]
+        self.position = 0
+        if precision is not None:
+            _limit(self.nodes, precision)
+
+    def _run(self, target):
+        """works until the root has produced target digits"""
+        budget = current_budget()
+        pulls = 0
+        stack = [(self.root, target)]
+        while stack:
+            node, target = stack[-1]
+            produced = node.produced
+            if produced >= target or node.exhausted:
+                stack.pop()
+                continue
+            if node.precision is not None and produced >= node.precision:
+                node.exhausted = True
+                continue
+            lft = node.lft
+            if lft is None:
+                if node.precision is not None:
+                    target = min(target, node.precision)
+                digits = take(node.source, target - produced)
+                node.digits.extend(digits)
+                # a finite leaf, the nodes above it use the digits it had before they stop
+                node.exhausted = produced + len(digits) < target
+                continue
+            index = lft.next_index_to_pull
+            if index is None:
+                node.digits.append(lft.extract())
+                lft.normalize()
+                if node.precision is not None:
+                    bound_coefficients(lft, node.precision - node.produced)
+                node.pulled = [0] * len(node.operands)
+                continue
+            if node.aliased:
+                # the positions of both arguments move together
+                index = 0
+            operand = node.operands[index]
+            position = node.positions[index]
+            if position >= operand.produced:
+                if operand.exhausted:
+                    node.exhausted = True
+                    continue
+                # request as many operand digits as are likely needed for the whole target
+                stack.append((operand, position + operand_digits_needed(lft, target - produced)))
+                continue
+            if budget is not None:
+                pulls += 1
+                if pulls == CHECK_INTERVAL:
+                    pulls = 0
+                    budget.spend(CHECK_INTERVAL, lft)
+            node.pulled[index] += 1
+            if is_burst(node.pulled[index]):
+                cycle = operand.cycle_at(position)
+                if cycle is not None:
+                    if isinstance(lft, LFTOne):
+                        apply, pulling = LFTOne.times, pulls_any
+                    elif node.aliased:
+                        apply, pulling = LFTTwo.timesXY, pulls_any
+                    elif isinstance(lft, LFTTensor):
+                        apply = functools.partial(LFTTensor.times, index=index)
+                        pulling = functools.partial(pulls_index, index)
+                    else:
+                        apply, pulling = (LFTTwo.timesX, pulls_x) if index == 0 else (LFTTwo.timesY, pulls_y)
+                    node.lft, count = absorb_cycles(lft, cycle, apply, pulling)
+                    if count:
+                        node.positions[index] = position + count * len(cycle)
+                        if node.aliased:
+                            node.positions[1] = node.positions[0]
+                        continue
+            digit = operand.digit(position)
+            node.positions[index] = position + 1
+            if isinstance(lft, LFTOne):
+                lft.timesdigit(digit)
+            elif node.aliased:
+                node.positions[1] = position + 1
+                lft.timesDigitXY(digit)
+            elif isinstance(lft, LFTTensor):
+                lft.timesDigit(digit, index)
+            elif index == 0:
+                lft.timesDigitX(digit)
+            else:
+                lft.timesDigitY(digit)
+        if budget is not None:
+            budget.spend(pulls)
+
+    def _trim(self):
+        self.root.trim(self.position)
+        for node in self.nodes:
+            if node.readers:
+                node.trim(min(reader.positions[index] for reader, index in node.readers))
+
+    def __next__(self):
+        digits = self.take(1)
+        if not digits:
+            raise StopIteration()
+        return digits[0]
+
+    def take(self, count):
+        root = self.root
+        if root.produced < self.position + count:
+            self._run(self.position + count)
+        start = self.position - root.base
+        digits = root.digits[start:start + count]
+        self.position += len(digits)
+        if len(root.digits) >= 2 * _TRIM_THRESHOLD:
+            self._trim()
+        return digits
+
+
+__all__ = ["ScheduledDigits"]
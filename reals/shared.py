@@ -0,0 +1,103 @@
+"""Numbers shared between threads. A SharedDigits computes every digit once, from a single
+producer, and hands them out to any number of readers, each at its own position"""
+import itertools
+import threading
+from .budget import current_budget
+from .streams import DigitIterator, take
+
+# the producer computes at least this many digits at once, waiting readers are woken per batch
+_BATCH = 64
+
+
+class SharedDigits():
+    """a digitstream whose iterators all read from one cache of digits. Readers of digits
+    already in the cache do not take any lock. A reader past the end of the cache either
+    becomes the producer, or waits until the producer has appended its next batch"""
+
+    def __init__(self, digitstream):
+        self._source = digitstream()
+        self._digits = []
+        self._finished = False
+        self._condition = threading.Condition()
+        self._producing = False
+        # the furthest any reader has asked for, the producer works up to there
+        self._wanted = 0
+
+    def __getstate__(self):
+        with self._condition:
+            return {"source": self._source, "digits": list(self._digits), "finished": self._finished}
+
+    def __setstate__(self, state):
+        self._source = state["source"]
+        self._digits = state["digits"]
+        self._finished = state["finished"]
+        self._condition = threading.Condition()
+        self._producing = False
+        self._wanted = 0
+
+    def __call__(self):
+        return SharedDigitIterator(self)
+
+    def __len__(self):
+        return len(self._digits)
+
+    def _produce(self, count):
+        """makes sure there are count digits, unless the source ends before"""
+        condition = self._condition
+        with condition:
+            self._wanted = max(self._wanted, count)
+            while len(self._digits) < count and not self._finished:
+                if self._producing:
+                    condition.wait()
+                    continue
+                self._producing = True
+                needed = max(self._wanted, len(self._digits) + _BATCH) - len(self._digits)
+                digits = []
+                # compute without holding the lock, readers of the cache go on meanwhile
+                condition.release()
+                try:
+                    if current_budget() is None:
+                        digits = take(self._source, needed)
+                    else:
+                        # the producer works under the budget of the reader it works for. The digits
+                        # it computed before the budget runs out are kept for the other readers
+                        for digit in itertools.islice(self._source, needed):
+                            digits.append(digit)
+                finally:
+                    condition.acquire()
+                    self._digits.extend(digits)
+                    self._producing = False
+                    condition.notify_all()
+                if len(digits) < needed:
+                    self._finished = True
+
+    def digits(self, start, count):
+        digits = self._digits
+        if len(digits) < start + count:
+            self._produce(start + count)
+        return self._digits[start:start + count]
+
+
+class SharedDigitIterator(DigitIterator):
+    """one reader of a SharedDigits"""
+
+    def __init__(self, shared, position=0):
+        self.shared = shared
+        self.position = position
+
+    def __next__(self):
+        digits = self.take(1)
+        if not digits:
+            raise StopIteration()
+        return digits[0]
+
+    def take(self, count):
+        digits = self.shared.digits(self.position, count)
+        self.position += len(digits)
+        return digits
+
+    def skip(self, count):
+        self.position += count
+
+
+__all__ = ["SharedDigits", "SharedDigitIterator"]
@@ -0,0 +1,288 @@
+"""Buffered output of digit streams. Formatters turn whole blocks of digits into bytes,
+a DigitSink collects those in a reusable buffer and writes them out in large chunks"""
+import array
+import math
+import os
+import sys
+import time
+from .defs import EXPONENT_2, POWER_2
+from .store import digit_typecode
+from .streams import ConvertBaseDigits, periodic, take
+
+# the decimal digits DecimalFormatter checks at once, well below the limit of int to str conversions
+_DECIMAL_PIECE = 1000
+
+
+class DigitSink():
+    """writes bytes to a binary file object or a file descriptor through a buffer
+    of buffer_size bytes. With a max_delay, buffered bytes are also written out once
+    they are older than max_delay seconds, for interactive output"""
+
+    def __init__(self, out, buffer_size=1 << 16, max_delay=None):
+        self._out = out
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._fill = 0
+        self.max_delay = max_delay
+        self.bytes_written = 0
+        self._started = self._flushed = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def _write_out(self, data):
+        if isinstance(self._out, int):
+            view = memoryview(data)
+            while view:
+                written = os.write(self._out, view)
+                view = view[written:]
+        else:
+            self._out.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, data):
+        size = len(data)
+        if self._fill + size > len(self._buffer):
+            self.flush()
+            if size >= len(self._buffer):
+                self._write_out(data)
+                return
+        self._buffer[self._fill:self._fill + size] = data
+        self._fill += size
+        if self.max_delay is not None and time.perf_counter() - self._flushed > self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if self._fill:
+            self._write_out(self._view[:self._fill])
+            self._fill = 0
+        self._flushed = time.perf_counter()
+        if not isinstance(self._out, int) and hasattr(self._out, "flush"):
+            self._out.flush()
+
+    @property
+    def throughput(self):
+        """bytes per second written since the sink was created"""
+        elapsed = time.perf_counter() - self._started
+        return self.bytes_written / elapsed if elapsed > 0 else 0.0
+
+
+class _TextFormatter():
+    def __init__(self, line_length):
+        self.line_length = line_length
+        self._column = 0
+
+    def _wrap(self, text):
+        """breaks the digits in text into lines of line_length characters"""
+        if not self.line_length or not text:
+            return text.encode("ascii")
+        first = self.line_length - self._column
+        if len(text) < first:
+            self._column += len(text)
+            return text.encode("ascii")
+        lines = [text[:first]]
+        lines.extend(text[i:i + self.line_length] for i in range(first, len(text), self.line_length))
+        last = lines.pop()
+        self._column = len(last) if lines else self._column + len(last)
+        if self._column == self.line_length:
+            lines.append(last)
+            last = ""
+            self._column = 0
+        return ("\n".join(lines) + "\n" + last).encode("ascii")
+
+    def _header(self, sign):
+        text = ("-" if sign < 0 else " ") + "."
+        return (text + "\n").encode("ascii") if self.line_length else text.encode("ascii")
+
+
+class HexFormatter(_TextFormatter):
+    """the hex expansion of a number given by digits of base 2**exponent. The absolute value
+    is written after a sign and a point. Signed digits are resolved per block: only the last
+    non zero hex digit (and the zeros after it) are held back, since only they can still
+    change by a borrow from the following digits"""
+
+    def __init__(self, exponent=EXPONENT_2, line_length=64):
+        if exponent % 4:
+            raise ValueError("hex output needs digits of a base 16**n")
+        super().__init__(line_length)
+        self.exponent = exponent
+        self._nibbles = exponent // 4
+        self._sign = 0
+        self._pending = 0
+        self._pending_length = 0
+
+    def feed(self, digits):
+        out = b""
+        nibbles = self._nibbles
+        start = 0
+        if self._sign == 0:
+            while start < len(digits) and digits[start] == 0:
+                self._pending_length += nibbles
+                start += 1
+            if start == len(digits):
+                return out
+            self._sign = 1 if digits[start] > 0 else -1
+            out = self._header(self._sign) + self._wrap("0" * self._pending_length)
+            self._pending_length = 0
+        last = len(digits) - 1
+        while last >= start and digits[last] == 0:
+            last -= 1
+        if last < start:
+            zeroes = (len(digits) - start) * nibbles
+            self._pending <<= 4 * zeroes
+            self._pending_length += zeroes
+            return out
+        sign, exponent = self._sign, self.exponent
+        value = self._pending
+        for digit in digits[start:last + 1]:
+            value = (value << exponent) + sign * digit
+        last_digit = abs(digits[last])
+        trailing = ((last_digit & -last_digit).bit_length() - 1) // 4
+        value >>= 4 * trailing
+        length = self._pending_length + (last + 1 - start) * nibbles - trailing
+        if length > 1:
+            out += self._wrap("%0*x" % (length - 1, value >> 4))
+        zeroes = (len(digits) - 1 - last) * nibbles + trailing
+        self._pending = (value & 0xf) << (4 * zeroes)
+        self._pending_length = 1 + zeroes
+        return out
+
+    def settle(self, tail):
+        """writes out the held back digits, if the digits still to come, given as (prefix, cycle)
+        of a periodic stream, can not borrow from them anymore"""
+        if self._sign == 0 or self._pending_length == 0:
+            return b""
+        prefix, cycle = tail
+        if any(self._sign * digit < 0 for digit in prefix + cycle):
+            return b""
+        out = self._wrap("%0*x" % (self._pending_length, self._pending))
+        self._pending = self._pending_length = 0
+        return out
+
+    def finish(self, next_digit):
+        """the held back digits, rounded the way format_hex does it by the sign of next_digit"""
+        if self._sign == 0:
+            return self._header(1) + self._wrap("0" * self._pending_length)
+        if self._pending_length == 0:
+            return b""
+        pending = self._pending - (1 if self._sign * next_digit < 0 else 0)
+        return self._wrap("%0*x" % (self._pending_length, pending))
+
+
+class DecimalFormatter(_TextFormatter):
+    """the decimal expansion of a number given by digits of base 2**exponent. A decimal
+    digit is written as soon as every number in the current interval agrees on it.
+    Only the part of the value below the written digits is kept, as _remainder / 2**_bits
+    with the radius 10**_written / 2**_bits of the interval around it, so the whole
+    value is never converted to a string"""
+
+    def __init__(self, exponent=EXPONENT_2, line_length=64):
+        super().__init__(line_length)
+        self.exponent = exponent
+        self._sign = 0
+        self._remainder = 0
+        self._bits = 0
+        self._written = 0
+        self._scale = 1
+
+    def feed(self, digits):
+        exponent = self.exponent
+        block = 0
+        for digit in digits:
+            block = (block << exponent) + digit
+        shift = exponent * len(digits)
+        self._bits += shift
+        self._remainder = (self._remainder << shift) + (self._sign or 1) * block * self._scale
+        out = b""
+        if self._sign == 0:
+            if self._remainder - 1 > 0:
+                self._sign = 1
+            elif self._remainder + 1 < 0:
+                self._sign = -1
+                self._remainder = -self._remainder
+            else:
+                return out
+            out = self._header(self._sign)
+        # as many digits as the interval can decide, checked at most _DECIMAL_PIECE at a time
+        precision = int(self._bits * math.log10(2))
+        while self._written < precision:
+            count = min(_DECIMAL_PIECE, precision - self._written)
+            agreeing = self._agreeing(count)
+            if agreeing > 0:
+                out += self._wrap(self._take(agreeing))
+            if agreeing < count:
+                break
+        return out
+
+    def _agreeing(self, count):
+        """the number of the next count digits that are the same for every number in the interval"""
+        power = 10 ** count
+        lower = (max(self._remainder - self._scale, 0) * power) >> self._bits
+        upper = ((self._remainder + self._scale) * power) >> self._bits
+        if lower == upper:
+            return count
+        # the digits differ at least from the last digit of upper - lower on
+        held = max(1, int(((upper - lower).bit_length() - 1) * math.log10(2)))
+        while lower // 10 ** held != upper // 10 ** held:
+            held += 1
+        # if the interval reaches up to 1 (upper has count + 1 digits), no digit is certain yet
+        return count - held
+
+    def _take(self, count):
+        """writes out the next count digits, which the interval decides"""
+        power = 10 ** count
+        digits = (max(self._remainder - self._scale, 0) * power) >> self._bits
+        self._remainder = self._remainder * power - (digits << self._bits)
+        self._scale *= power
+        self._written += count
+        return "%0*d" % (count, digits)
+
+    def finish(self, next_digit):
+        return b""
+
+
+class PackedFormatter():
+    """the digits themselves, as little endian signed integers of the smallest fitting width"""
+
+    def __init__(self, exponent=EXPONENT_2):
+        self.exponent = exponent
+        self.typecode = digit_typecode(exponent)
+
+    def feed(self, digits):
+        packed = array.array(self.typecode, digits)
+        if sys.byteorder != "little":
+            packed.byteswap()
+        return packed.tobytes()
+
+    def finish(self, next_digit):
+        return b""
+
+
+def write_digits(digitstream, sink, formatter, count=None, block=256):
+    """writes count digits (or forever) of digitstream through formatter into sink,
+    fetching block digits at a time. Stops early at the end of a finite stream,
+    returns the number of digits written"""
+    digits = digitstream()
+    if formatter.exponent != EXPONENT_2:
+        digits = ConvertBaseDigits(digits, POWER_2, 2 ** formatter.exponent)
+    written = 0
+    while count is None or written < count:
+        size = block if count is None else min(block, count - written)
+        batch = take(digits, size)
+        sink.write(formatter.feed(batch))
+        written += len(batch)
+        if len(batch) < size:
+            break
+        tail = periodic(digits)
+        if tail is not None and hasattr(formatter, "settle"):
+            sink.write(formatter.settle(tail))
+    # a finite stream (e.g. one with a precision) has no further digit to round by
+    sink.write(formatter.finish(next(digits, 0)))
+    sink.flush()
+    return written
+
+
+__all__ = ["DigitSink", "HexFormatter", "DecimalFormatter", "PackedFormatter", "write_digits"]
@@ -0,0 +1,177 @@
+import array
+import mmap
+import os
+import pickle
+import sys
+from .defs import EXPONENT_2
+from .checkpoint import checkpoint
+from .streams import DigitIterator
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locking available, the store is only safe for a single process
+    fcntl = None
+
+
+def digit_typecode(exponent):
+    """the smallest signed array typecode that can hold a digit of base 2**exponent.
+    Digits are in the open interval (-2**exponent, 2**exponent), so they need one bit
+    more than the exponent"""
+    for typecode in "bhiq":
+        if exponent < 8 * array.array(typecode).itemsize:
+            return typecode
+    raise ValueError("digits of base 2**{} do not fit into 64 bits".format(exponent))
+
+
+class DigitStore():
+    """A directory of packed digit files, one per constant and digit width.
+    Each file holds the digits of the constant as little endian signed integers,
+    next to it the evaluation state at the end of the file is kept, so that
+    readers can continue computing where the file stops"""
+
+    def __init__(self, directory, exponent=EXPONENT_2):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.exponent = exponent
+
+    def path(self, name):
+        return os.path.join(self.directory, "{}.{}.digits".format(name, self.exponent))
+
+    def stream(self, name, digitstream, flush_interval=256):
+        """returns a digitstream producing the digits of digitstream, reading them from
+        the store as far as they are available and appending newly computed ones"""
+        def stored():
+            return StoredDigits(self.path(name), self.exponent, digitstream, flush_interval)
+        return stored
+
+
+class StoredDigits(DigitIterator):
+    def __init__(self, path, exponent, digitstream, flush_interval=256):
+        self.path = path
+        self.state_path = path + ".state"
+        self.lock_path = path + ".lock"
+        self.typecode = digit_typecode(exponent)
+        self.itemsize = array.array(self.typecode).itemsize
+        self.digitstream = digitstream
+        self.flush_interval = flush_interval
+        self.position = 0
+        self._source = None
+        self._pending = array.array(self.typecode)
+        self._mapped = 0
+        self._mmap = None
+        self._view = None
+        self._remap()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_mmap"] = state["_view"] = None
+        state["_mapped"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._remap()
+
+    def _remap(self):
+        try:
+            count = os.path.getsize(self.path) // self.itemsize
+        except FileNotFoundError:
+            count = 0
+        if count <= self._mapped:
+            return
+        self._unmap()
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), count * self.itemsize, access=mmap.ACCESS_READ)
+        if sys.byteorder == "little":
+            self._view = memoryview(self._mmap).cast(self.typecode)
+        else:
+            self._view = array.array(self.typecode, self._mmap)
+            self._view.byteswap()
+        self._mapped = count
+
+    def _unmap(self):
+        if self._view is not None:
+            if isinstance(self._view, memoryview):
+                self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _continuation(self):
+        """the evaluation state at self.position, preferably from the store"""
+        source, count = None, 0
+        try:
+            with open(self.state_path, "rb") as f:
+                count, source = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+        if source is None or count > self.position:
+            source, count = self.digitstream(), 0
+        for _ in range(self.position - count):
+            next(source)
+        return source
+
+    def _next_digit(self):
+        position = self.position
+        if position < self._mapped:
+            self.position = position + 1
+            return self._view[position]
+        if self._source is None:
+            # another process might have extended the store in the meantime
+            self._remap()
+            if position < self._mapped:
+                return next(self)
+            self._source = self._continuation()
+        digit = next(self._source)
+        self.position = position + 1
+        self._pending.append(digit)
+        if len(self._pending) >= self.flush_interval:
+            self.flush()
+        return digit
+
+    def flush(self):
+        """appends the digits computed since the last flush to the store"""
+        pending = self._pending
+        if not pending:
+            return
+        start = self.position - len(pending)
+        with open(self.lock_path, "ab") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                with open(self.path, "ab") as f:
+                    count = f.tell() // self.itemsize
+                    # only ever append directly at the end, some other process
+                    # might have written (some of) our digits already
+                    if start <= count < self.position:
+                        new_digits = pending[count - start:]
+                        if sys.byteorder != "little":
+                            new_digits.byteswap()
+                        f.truncate(count * self.itemsize)
+                        new_digits.tofile(f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        checkpoint((self.position, self._source), self.state_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+        self._pending = array.array(self.typecode)
+
+    def close(self):
+        self.flush()
+        self._unmap()
+
+
+def checkpointed(digitstream, path, interval=1024):
+    """wraps a digitstream such that its progress is saved every interval digits. The
+    digits computed so far are kept in path, the evaluation state after them next to it.
+    Every reader starts with the first digit, reads the kept digits and continues the
+    evaluation from the saved state, instead of starting over"""
+    def stored():
+        return StoredDigits(path, EXPONENT_2, digitstream, interval)
+    return stored
+
+
+__all__ = ["DigitStore", "StoredDigits", "digit_typecode", "checkpointed"]
@@ -0,0 +1,693 @@
+import array
+import functools
+import itertools
+import math
+import sys
+from .bbp import hex_digits
+from .budget import CHECK_INTERVAL, BudgetExceeded, current_budget
+from .defs import EXPONENT_2, POWER_2
+from .evaluation import absorb_cycles, bound_coefficients, is_burst, operand_digits_needed, pulls_any, \
+    pulls_index, pulls_x, pulls_y
+from .lft_one import LFTOne
+from .lft_two import LFTTwo
+from .lft_tensor import LFTTensor
+
+
+class DigitIterator():
+    """An iterator over the digits of a number. Unlike a generator, all
+    state lives in plain attributes so that a running stream can be pickled.
+    Subclasses compute the next digit in _next_digit, those that override
+    __next__ instead also override take, so that no digits are kept"""
+    # digits computed by a take that ran out of budget, handed out before any new ones
+    _kept = ()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._kept:
+            return self._kept.pop(0)
+        return self._next_digit()
+
+    def _next_digit(self):
+        """the next digit, raises StopIteration at the end of a finite stream"""
+        raise NotImplementedError()
+
+    def take(self, count):
+        """returns the next count digits as a list, fewer at the end of a finite stream.
+        Iterators that know how many digits of their operands this needs override this
+        to fetch those in bulk beforehand"""
+        return self._next_digits(count)
+
+    def _next_digits(self, count):
+        """count digits from __next__. When the budget runs out meanwhile, the digits
+        computed so far are kept, to be returned first by the next take or __next__"""
+        digits = []
+        if self._kept:
+            digits, self._kept = self._kept[:count], self._kept[count:]
+        try:
+            while len(digits) < count:
+                digits.append(next(self))
+        except StopIteration:
+            pass
+        except BudgetExceeded:
+            self._kept = digits
+            raise
+        return digits
+
+    def periodic(self):
+        """returns (prefix, cycle) if the remaining digits are known to be those of prefix,
+        followed by those of cycle repeated forever, else None"""
+        return None
+
+    def skip(self, count):
+        for _ in range(count):
+            next(self)
+
+
+def take(digits, count):
+    """the next count digits of any digit iterator, as a list"""
+    if isinstance(digits, DigitIterator):
+        return digits.take(count)
+    return list(itertools.islice(digits, count))
+
+
+def take_within_budget(digits, count, batch=16):
+    """like take, but returns the digits fetched so far, maybe fewer than count, once the
+    current budget runs out. The digits are fetched in batches doubling in size, the digits
+    of a batch under way when the budget runs out are not returned, but kept by the
+    iterator for when it is continued"""
+    if current_budget() is None:
+        return take(digits, count)
+    fetched = []
+    while len(fetched) < count:
+        size = min(batch, count - len(fetched))
+        try:
+            fetched_batch = take(digits, size)
+        except BudgetExceeded:
+            break
+        fetched.extend(fetched_batch)
+        if len(fetched_batch) < size:
+            # a finite stream
+            break
+        batch *= 2
+    return fetched
+
+
+def periodic(digits):
+    """(prefix, cycle) of the remaining digits of any digit iterator, see DigitIterator.periodic"""
+    if isinstance(digits, DigitIterator):
+        return digits.periodic()
+    return None
+
+
+def plan(digits, count):
+    """returns an iterator over the same digits as digits, with (at least) the
+    next count digits already fetched in one batch"""
+    if periodic(digits) is not None:
+        # the digits are known anyway, and must stay recognizable as periodic
+        return digits
+    if not isinstance(digits, PrefetchedDigits):
+        digits = PrefetchedDigits(digits)
+    digits.prefetch(count)
+    return digits
+
+
+def _absorb_periodic(lft, source, apply, pulling):
+    """if the digits of source are periodic from here on, absorbs whole cycles of them in closed
+    form (see absorb_cycles) and skips them in source. Returns the new lft"""
+    tail = periodic(source)
+    if tail is None or tail[0]:
+        return lft
+    cycle = tail[1]
+    lft, count = absorb_cycles(lft, cycle, apply, pulling)
+    if count:
+        source.skip(count * len(cycle))
+    return lft
+
+
+class PrefetchedDigits(DigitIterator):
+    """the digits in buffer, followed by those of source"""
+
+    def __init__(self, source, buffer=()):
+        self.source = source
+        self._buffer = list(buffer)
+        self._index = 0
+
+    def prefetch(self, count):
+        missing = count - (len(self._buffer) - self._index)
+        if missing > 0:
+            self._buffer = self._buffer[self._index:] + take(self.source, missing)
+            self._index = 0
+
+    def __next__(self):
+        index = self._index
+        if index < len(self._buffer):
+            self._index = index + 1
+            return self._buffer[index]
+        return next(self.source)
+
+    def take(self, count):
+        self.prefetch(count)
+        index = self._index
+        self._index = index + count
+        return self._buffer[index:index + count]
+
+    def periodic(self):
+        tail = periodic(self.source)
+        if tail is None:
+            return None
+        prefix, cycle = tail
+        return tuple(self._buffer[self._index:]) + prefix, cycle
+
+    def skip(self, count):
+        buffered = min(count, len(self._buffer) - self._index)
+        self._index += buffered
+        if count > buffered:
+            self.source.skip(count - buffered)
+
+
+class ConstantDigits(DigitIterator):
+    def __init__(self, digit):
+        self.digit = digit
+
+    def __next__(self):
+        return self.digit
+
+    def take(self, count):
+        return [self.digit] * count
+
+    def periodic(self):
+        return (), (self.digit,)
+
+    def skip(self, count):
+        pass
+
+
+class PeriodicDigits(DigitIterator):
+    """the digits of prefix, followed by the digits of cycle repeated forever"""
+
+    def __init__(self, prefix, cycle):
+        if not cycle:
+            raise ValueError("the cycle must not be empty")
+        self.prefix = tuple(prefix)
+        self.cycle = tuple(cycle)
+        self.position = 0
+
+    @classmethod
+    def from_fraction(cls, frac, max_length=None):
+        """the digits of a fraction in [-1, 1]. Returns None if prefix and cycle together
+        would be longer than max_length"""
+        if not abs(frac) <= 1:
+            raise ValueError("fraction must be in the interval [-1, 1]")
+        sign = -1 if frac < 0 else 1
+        if abs(frac) == 1:
+            return cls((), (sign * (POWER_2 - 1),))
+        numerator, denominator = abs(frac).numerator, abs(frac).denominator
+        digits = []
+        # the digits repeat as soon as a remainder does
+        seen = {}
+        while numerator not in seen:
+            if max_length is not None and len(digits) >= max_length:
+                return None
+            seen[numerator] = len(digits)
+            digit, numerator = divmod(numerator << EXPONENT_2, denominator)
+            digits.append(sign * digit)
+        start = seen[numerator]
+        return cls(digits[:start], digits[start:])
+
+    def _digit(self, position):
+        prefix = self.prefix
+        if position < len(prefix):
+            return prefix[position]
+        return self.cycle[(position - len(prefix)) % len(self.cycle)]
+
+    def __next__(self):
+        position = self.position
+        self.position = position + 1
+        return self._digit(position)
+
+    def take(self, count):
+        position = self.position
+        self.position = position + count
+        return [self._digit(p) for p in range(position, position + count)]
+
+    def periodic(self):
+        prefix, cycle, position = self.prefix, self.cycle, self.position
+        if position < len(prefix):
+            return prefix[position:], cycle
+        phase = (position - len(prefix)) % len(cycle)
+        return (), cycle[phase:] + cycle[:phase]
+
+    def skip(self, count):
+        self.position += count
+
+
+class BBPDigits(DigitIterator):
+    """this calculates pi - 3 in base 2**32 via the BBP formula.
+    n is the index of the next hex digit to be calculated"""
+
+    def __init__(self, n=0):
+        self.n = n
+
+    def __next__(self):
+        n = self.n
+        x = hex_digits(n, 8)
+        self.n = n + 8
+        return x
+
+    def take(self, count):
+        # one evaluation of the series for the whole block
+        n = self.n
+        x = hex_digits(n, 8 * count)
+        self.n = n + 8 * count
+        return [(x >> (32 * (count - 1 - i))) & 0xffffffff for i in range(count)]
+
+
+def _is_power2(n):
+    return not (n & (n - 1))
+
+
+def _exact_log2(n):
+    return n.bit_length() - 1
+
+
+def _is_exactly_convertible(bf, bt):
+    while bt > 1:
+        if bt % bf != 0:
+            return False
+        bt //= bf
+    return True
+
+
+def _discrete_log(bf, bt):
+    n = 0
+    while bt > 1:
+        bt //= bf
+        n += 1
+    return n
+
+
+def _largest_shared_power(bf, bt):
+    while bt > 1:
+        while bf % bt == 0:
+            bf //= bt
+        bf, bt = bt, bf
+    return bf
+
+
+# array typecodes of unsigned integers by their size in bytes
+_UNSIGNED_TYPECODES = {array.array(code).itemsize: code for code in "QLIHB"}
+_TO_HEX = bytes.maketrans(bytes(range(16)), b"0123456789abcdef")
+_FROM_HEX = bytes.maketrans(b"0123456789abcdef", bytes(range(16)))
+
+
+def _pack(digits, width):
+    """the integer whose base 2**width digits are the non-negative digits"""
+    if width % 8 == 0 and width // 8 in _UNSIGNED_TYPECODES:
+        packed = array.array(_UNSIGNED_TYPECODES[width // 8], digits)
+        if sys.byteorder == "little":
+            packed.byteswap()
+        return int.from_bytes(packed.tobytes(), "big")
+    if width == 4:
+        return int(bytes(digits).translate(_TO_HEX) or b"0", 16)
+    if width % 4 == 0:
+        return int("".join(map(("{:0%dx}" % (width // 4)).format, digits)) or "0", 16)
+    return int("".join(map(("{:0%db}" % width).format, digits)) or "0", 2)
+
+
+def _unpack(value, width, count):
+    """the last count base 2**width digits of value, inverse to _pack"""
+    if width % 8 == 0 and width // 8 in _UNSIGNED_TYPECODES:
+        unpacked = array.array(_UNSIGNED_TYPECODES[width // 8])
+        unpacked.frombytes(value.to_bytes(count * width // 8, "big"))
+        if sys.byteorder == "little":
+            unpacked.byteswap()
+        return unpacked.tolist()
+    if width == 4:
+        return list(("{:0%dx}" % count).format(value).encode().translate(_FROM_HEX))
+    if width % 4 == 0:
+        chars = width // 4
+        text = ("{:0%dx}" % (count * chars)).format(value)
+        return [int(text[i:i + chars], 16) for i in range(0, len(text), chars)]
+    text = ("{:0%db}" % (count * width)).format(value)
+    return [int(text[i:i + width], 2) for i in range(0, len(text), width)]
+
+
+class _Regrouping():
+    """the conversion between two power-of-two bases, worked out once per pair of bases.
+    The positive and the negative parts of a block of source digits are packed into one
+    integer each, every target digit is the difference of the two fields it covers.
+    This is what splitting and grouping digit by digit produces as well"""
+
+    def __init__(self, orig_width, target_width):
+        unit = math.lcm(orig_width, target_width)
+        # a block of source_digits source digits becomes target_digits target digits
+        self.source_digits = unit // orig_width
+        self.target_digits = unit // target_width
+        self.orig_width = orig_width
+        self.target_width = target_width
+
+    def _fields(self, digits, count):
+        orig_width, target_width = self.orig_width, self.target_width
+        # drop the source bits that do not make up a whole target digit
+        excess = len(digits) * orig_width - count * target_width
+        return _unpack(_pack(digits, orig_width) >> excess, target_width, count)
+
+    def __call__(self, digits):
+        count = len(digits) * self.orig_width // self.target_width
+        if not digits or min(digits) >= 0:
+            return self._fields(digits, count)
+        positive = self._fields([d if d > 0 else 0 for d in digits], count)
+        negative = self._fields([-d if d < 0 else 0 for d in digits], count)
+        return [p - n for p, n in zip(positive, negative)]
+
+
+@functools.lru_cache(maxsize=None)
+def _regrouping(orig_base, target_base):
+    """the conversion between two power-of-two bases, or None for other bases"""
+    if not (_is_power2(orig_base) and _is_power2(target_base)):
+        return None
+    return _Regrouping(_exact_log2(orig_base), _exact_log2(target_base))
+
+
+class ConvertBaseDigits(DigitIterator):
+    MODE_GROUP = 0
+    MODE_SPLIT = 1
+    MODE_CHAIN = 2
+    MODE_BLOCK = 3
+
+    def __init__(self, source, orig_base, target_base):
+        self.source = source
+        self.orig_base = orig_base
+        self.target_base = target_base
+        self._pending = []
+        self._regrouping = _regrouping(orig_base, target_base)
+        if self._regrouping is not None:
+            # pull whole blocks of source digits and regroup them at once
+            self._mode = ConvertBaseDigits.MODE_BLOCK
+            self._index = 0
+        elif _is_exactly_convertible(orig_base, target_base):
+            # original base is smaller, but fits exactly
+            self._mode = ConvertBaseDigits.MODE_GROUP
+            self._digits_per_step = _discrete_log(orig_base, target_base)
+        elif _is_exactly_convertible(target_base, orig_base):
+            # target base is smaller, but fits exactly
+            self._mode = ConvertBaseDigits.MODE_SPLIT
+            self._digits_per_step = _discrete_log(target_base, orig_base)
+        else:
+            shared_power = _largest_shared_power(target_base, orig_base)
+            if shared_power == 1:
+                raise NotImplementedError()
+            self._mode = ConvertBaseDigits.MODE_CHAIN
+            self.source = ConvertBaseDigits(ConvertBaseDigits(source, orig_base, shared_power),
+                                            shared_power, target_base)
+
+    def _split_trgt_base(self, p, n):
+        # this is complicated by the fact that
+        # each digit can either be positive or
+        # negative! This leads us to the realization
+        # that there is no one unique sequence
+        # realizing the split but rather multiple
+        target_base = self.target_base
+        if _is_power2(target_base):
+            shift = n * _exact_log2(target_base)
+            split = - (-p >> shift) if p < 0 else p >> shift
+            rest = p - (split << shift)
+            return rest, split
+        base_pow = pow(target_base, n)
+        split = p // base_pow
+        if split < 0:
+            split += 1
+        rest = p - split * base_pow
+        return rest, split
+
+    def _refill(self, count):
+        """regroups enough source digits to have count pending target digits"""
+        pending = self._pending[self._index:]
+        regrouping = self._regrouping
+        blocks = -(-(count - len(pending)) // regrouping.target_digits)
+        if blocks > 0:
+            pending.extend(regrouping(take(self.source, blocks * regrouping.source_digits)))
+        self._pending = pending
+        self._index = 0
+
+    def _next_digit(self):
+        mode = self._mode
+        if mode == ConvertBaseDigits.MODE_BLOCK:
+            index = self._index
+            if index >= len(self._pending):
+                self._refill(1)
+                index = 0
+                if not self._pending:
+                    raise StopIteration()
+            self._index = index + 1
+            return self._pending[index]
+        if mode == ConvertBaseDigits.MODE_GROUP:
+            # taken at once, the source keeps them if the budget runs out in between
+            digits = take(self.source, self._digits_per_step)
+            if len(digits) < self._digits_per_step:
+                raise StopIteration()
+            orig_base = self.orig_base
+            out = 0
+            if _is_power2(orig_base):
+                shift = _exact_log2(orig_base)
+                for digit in digits:
+                    out = (out << shift) + digit
+            else:
+                for digit in digits:
+                    out = out * orig_base + digit
+            return out
+        elif mode == ConvertBaseDigits.MODE_SPLIT:
+            pending = self._pending
+            if not pending:
+                digit = next(self.source)
+                for n in range(self._digits_per_step - 1, -1, -1):
+                    digit, part = self._split_trgt_base(digit, n)
+                    pending.append(part)
+                pending.reverse()
+            return pending.pop()
+        return next(self.source)
+
+    def take(self, count):
+        if self._mode == ConvertBaseDigits.MODE_BLOCK:
+            if len(self._pending) - self._index < count:
+                self._refill(count)
+            index = self._index
+            digits = self._pending[index:index + count]
+            self._index = index + len(digits)
+            return digits
+        if self._mode == ConvertBaseDigits.MODE_GROUP:
+            needed = count * self._digits_per_step
+        elif self._mode == ConvertBaseDigits.MODE_SPLIT:
+            needed = -(-(count - len(self._pending)) // self._digits_per_step)
+        else:
+            needed = count
+        self.source = plan(self.source, needed)
+        return self._next_digits(count)
+
+
+class _TransformDigits(DigitIterator):
+    """the digits of an lft applied to the digits of its operands, see UnaryTransformDigits
+    for the precision. Subclasses pull operand digits into the lft in _pull and plan the
+    operands of a take in _plan"""
+
+    def __init__(self, lft, precision):
+        self.lft = lft.clone()
+        self.precision = precision
+        self.emitted = 0
+
+    def _pull(self, budget):
+        """pulls operand digits until self.lft can extract a digit, returns their number"""
+        raise NotImplementedError()
+
+    def _plan(self, needed):
+        """plans needed digits of every operand that might get pulled"""
+        raise NotImplementedError()
+
+    def _next_digit(self):
+        if self.precision is not None and self.emitted >= self.precision:
+            raise StopIteration()
+        budget = current_budget()
+        pulled = self._pull(budget)
+        lft = self.lft
+        if budget is not None:
+            budget.spend(pulled % CHECK_INTERVAL, lft)
+        digit = lft.extract()
+        lft.normalize()
+        self.emitted += 1
+        if self.precision is not None:
+            bound_coefficients(lft, self.precision - self.emitted)
+        return digit
+
+    def take(self, count):
+        if self.precision is not None:
+            count = min(count, len(self._kept) + self.precision - self.emitted)
+        self._plan(operand_digits_needed(self.lft, count))
+        return self._next_digits(count)
+
+
+class UnaryTransformDigits(_TransformDigits):
+    """with a precision, only that many digits are produced, but the coefficients
+    of the lft are kept as small as that precision allows"""
+
+    def __init__(self, lft, digitstream, precision=None):
+        super().__init__(lft, precision)
+        self.source = digitstream()
+
+    def _pull(self, budget):
+        lft = self.lft
+        pulled = 0
+        while lft.next_index_to_pull is not None:
+            pulled += 1
+            if budget is not None and not pulled % CHECK_INTERVAL:
+                budget.spend(CHECK_INTERVAL, lft)
+            if is_burst(pulled):
+                absorbed = _absorb_periodic(lft, self.source, LFTOne.times, pulls_any)
+                if absorbed is not lft:
+                    lft = self.lft = absorbed
+                    continue
+            lft.timesdigit(next(self.source))
+        return pulled
+
+    def _plan(self, needed):
+        self.source = plan(self.source, needed)
+
+
+class BinaryTransformDigits(_TransformDigits):
+    """see UnaryTransformDigits for the precision"""
+
+    def __init__(self, lft, xstream, ystream, precision=None):
+        super().__init__(lft, precision)
+        self.xsource = xstream()
+        self.ysource = ystream()
+
+    def _pull(self, budget):
+        lft = self.lft
+        next_pull = lft.next_index_to_pull
+        pulled = [0, 0]
+        while next_pull is not None:
+            pulled[next_pull] += 1
+            if budget is not None and not (pulled[0] + pulled[1]) % CHECK_INTERVAL:
+                budget.spend(CHECK_INTERVAL, lft)
+            absorbed = lft
+            if is_burst(pulled[next_pull]):
+                if next_pull == 0:
+                    absorbed = _absorb_periodic(lft, self.xsource, LFTTwo.timesX, pulls_x)
+                else:
+                    absorbed = _absorb_periodic(lft, self.ysource, LFTTwo.timesY, pulls_y)
+            if absorbed is not lft:
+                lft = self.lft = absorbed
+            elif next_pull == 0:
+                lft.timesDigitX(next(self.xsource))
+            else:
+                lft.timesDigitY(next(self.ysource))
+            next_pull = lft.next_index_to_pull
+        return pulled[0] + pulled[1]
+
+    def _plan(self, needed):
+        # which operand gets pulled is not predictable, plan for both
+        self.xsource = plan(self.xsource, needed)
+        self.ysource = plan(self.ysource, needed)
+
+
+class SquareTransformDigits(_TransformDigits):
+    """the digits of lft(x, x), like a BinaryTransformDigits with the same stream for both
+    arguments, but every digit of x is pulled once and applied to both arguments together.
+    See UnaryTransformDigits for the precision"""
+
+    def __init__(self, lft, digitstream, precision=None):
+        super().__init__(lft, precision)
+        self.source = digitstream()
+
+    def _pull(self, budget):
+        lft = self.lft
+        pulled = 0
+        while lft.next_index_to_pull is not None:
+            pulled += 1
+            if budget is not None and not pulled % CHECK_INTERVAL:
+                budget.spend(CHECK_INTERVAL, lft)
+            if is_burst(pulled):
+                absorbed = _absorb_periodic(lft, self.source, LFTTwo.timesXY, pulls_any)
+                if absorbed is not lft:
+                    lft = self.lft = absorbed
+                    continue
+            lft.timesDigitXY(next(self.source))
+        return pulled
+
+    def _plan(self, needed):
+        self.source = plan(self.source, needed)
+
+
+class TensorTransformDigits(_TransformDigits):
+    """the digits of an LFTTensor applied to the numbers of digitstreams, one for each
+    argument. See UnaryTransformDigits for the precision"""
+
+    def __init__(self, lft, digitstreams, precision=None):
+        assert len(digitstreams) == lft.arity
+        super().__init__(lft, precision)
+        self.sources = [digitstream() for digitstream in digitstreams]
+
+    def _pull(self, budget):
+        lft = self.lft
+        next_pull = lft.next_index_to_pull
+        pulled = [0] * lft.arity
+        total = 0
+        while next_pull is not None:
+            pulled[next_pull] += 1
+            total += 1
+            if budget is not None and not total % CHECK_INTERVAL:
+                budget.spend(CHECK_INTERVAL, lft)
+            absorbed = lft
+            if is_burst(pulled[next_pull]):
+                absorbed = _absorb_periodic(lft, self.sources[next_pull],
+                                            functools.partial(LFTTensor.times, index=next_pull),
+                                            functools.partial(pulls_index, next_pull))
+            if absorbed is not lft:
+                lft = self.lft = absorbed
+            else:
+                lft.timesDigit(next(self.sources[next_pull]), next_pull)
+            next_pull = lft.next_index_to_pull
+        return total
+
+    def _plan(self, needed):
+        # which operand gets pulled is not predictable, plan for all of them
+        self.sources = [plan(source, needed) for source in self.sources]
+
+
+class MatrixProductDigits(DigitIterator):
+    def __init__(self, lft_start, matrix_gen):
+        self.lft = lft_start.clone()
+        self.matrices = matrix_gen()
+        self._extracting = False
+
+    def _next_digit(self):
+        lft = self.lft
+        if self._extracting:
+            if lft.is_contracting and lft.next_index_to_pull is None:
+                return lft.extract()
+            lft.normalize()
+        budget = current_budget()
+        while not lft.is_contracting or lft.next_index_to_pull is not None:
+            if budget is not None:
+                budget.spend(1, lft)
+            lft.times(next(self.matrices))
+        self._extracting = True
+        return lft.extract()
+
+
+class Log2Matrices(DigitIterator):
+    def __init__(self, n=1):
+        self.n = n
+
+    def _next_digit(self):
+        n = self.n
+        self.n = n + 1
+        return LFTOne(- n, 2 * n + 1, -4 * n, 7 * n + 3)
+
+
+__all__ = [
+    "DigitIterator", "take", "take_within_budget", "periodic", "plan", "PrefetchedDigits", "ConstantDigits",
+    "PeriodicDigits", "BBPDigits", "ConvertBaseDigits", "UnaryTransformDigits",
+    "BinaryTransformDigits", "SquareTransformDigits", "TensorTransformDigits", "MatrixProductDigits", "Log2Matrices",
+]
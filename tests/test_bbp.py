@@ -0,0 +1,24 @@
+from reals import *
+from reals.bbp import digit_at, digits_range, hex_digits
+from reals.streams import take
+
+
+def test_hex_digits_of_pi():
+    assert hex_digits(0, 16) == 0x243F6A8885A308D3
+    assert hex_digits(8, 8) == 0x85A308D3
+
+
+def test_digit_at_matches_the_stream():
+    expected = take(adapted_bpp_arbitrary_base(), 40)
+    assert [digit_at(n) for n in (0, 1, 17, 39)] == [expected[n] for n in (0, 1, 17, 39)]
+
+
+def test_digits_range_in_other_bases():
+    expected = take(ConvertBaseDigits(adapted_bpp_arbitrary_base(), 2 ** 32, 2 ** 16), 30)
+    assert digits_range(5, 25, 16) == expected[5:]
+    assert digits_range(1, 4, 12, block=1) == [(0x243F6A8885A308D3 >> (64 - 12 * (n + 1))) & 0xfff
+                                              for n in range(1, 5)]
+
+
+def test_digits_range_in_parallel():
+    assert digits_range(10, 50, workers=2, block=16) == digits_range(10, 50)
@@ -0,0 +1,49 @@
+import fractions
+import pytest
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+COUNT = 60
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def _bits(lft):
+    return max(abs(coefficient) for coefficient in lft._matrix).bit_length()
+
+
+@pytest.mark.parametrize("transform", [
+    lambda precision: transform_unary(LFTOne(1, 1, 1, 3), log2_gen, precision),
+    lambda precision: transform_binary(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1), log2_gen, adapted_bpp_arbitrary_base,
+                                       precision),
+])
+def test_bounded_coefficients_keep_the_digits_correct(transform):
+    bounded, exact = transform(COUNT)(), transform(None)()
+    bounded_digits, exact_digits = list(bounded), take(exact, COUNT)
+    assert len(bounded_digits) == COUNT
+    assert abs(_value(bounded_digits) - _value(exact_digits)) <= fractions.Fraction(2, POWER_2 ** COUNT)
+    assert _bits(bounded.lft) < _bits(exact.lft)
+
+
+def test_round_coefficients_tracks_the_error():
+    lft = LFTOne(3 << 200, 1 << 200, 1 << 200, 5 << 200)
+    lft.round_coefficients(fractions.Fraction(1, 2 ** 40))
+    assert 0 < lft.error <= fractions.Fraction(1, 2 ** 40)
+    assert _bits(lft) < 200
+
+
+def test_bounded_numbers_keep_their_coefficients_small():
+    pi_minus_three = PrimRealNumber(adapted_bpp_arbitrary_base)
+    mul, neg = PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1)), PrimUnaryOperation(LFTOne(-1, 0, 0, 1))
+    number = mul(pi_minus_three, neg(pi_minus_three))
+    # without a precision, the coefficients grow by about 32 bits per digit
+    with pytest.raises(BudgetExceeded):
+        with Budget(bits=10000):
+            take(number._generator(), 400)
+    with Budget(bits=10000):
+        digits = take(number.bounded(400)._generator(), 500)
+    assert len(digits) == 400
+    assert abs(_value(digits) - _value(take(number._generator(), 400))) <= fractions.Fraction(2, POWER_2 ** 400)
@@ -0,0 +1,106 @@
+import fractions
+import pytest
+from reals import *
+from reals.streams import take
+
+
+def _interrupted(digits, count, pulls):
+    """takes count digits of the iterator digits, under a budget that runs out on the way"""
+    with pytest.raises(BudgetExceeded):
+        with Budget(pulls=pulls):
+            take(digits, count)
+
+
+def test_take_continues_after_the_budget_ran_out():
+    expected = take(log2_gen(), 40)
+    digits = log2_gen()
+    _interrupted(digits, 40, 30)
+    assert take(digits, 40) == expected
+
+
+def test_next_continues_after_the_budget_ran_out():
+    expected = take(log2_gen(), 40)
+    digits = log2_gen()
+    _interrupted(digits, 40, 30)
+    assert [next(digits) for _ in range(40)] == expected
+
+
+@pytest.mark.parametrize("digitstream", [
+    transform_unary(LFTOne(1, 0, 0, 2), log2_gen),
+    transform_binary(LFTTwo(0, 0, 1, 0, 1, 0, 0, 2), log2_gen, adapted_bpp_arbitrary_base),
+    transform_binary(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1), log2_gen, log2_gen),
+    transform_tensor(LFTTensor(0, 0, 1, 0, 1, 0, 0, 2), [log2_gen, adapted_bpp_arbitrary_base]),
+])
+def test_transforms_continue_after_the_budget_ran_out(digitstream):
+    expected = take(digitstream(), 30)
+    digits = digitstream()
+    for pulls in (40, 100):
+        _interrupted(digits, 30, pulls)
+    assert take(digits, 30) == expected
+
+
+class _Passing(DigitIterator):
+    """passes through the digits of source, with the take of DigitIterator"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def _next_digit(self):
+        return next(self.source)
+
+
+@pytest.mark.parametrize("digitstream", [
+    lambda: _Passing(log2_gen()),
+    transform_unary(LFTOne(1, 0, 0, 2), log2_gen, 30),
+])
+def test_iterators_with_the_inherited_take_keep_their_digits(digitstream):
+    expected = take(digitstream(), 30)
+    digits = digitstream()
+    for pulls in (20, 60):
+        _interrupted(digits, 30, pulls)
+    assert take(digits, 30) == expected
+
+
+def test_take_within_budget_can_be_continued():
+    expected = take(log2_gen(), 60)
+    digits = log2_gen()
+    with Budget(pulls=120):
+        fetched = take_within_budget(digits, 60)
+    assert 0 < len(fetched) < 60
+    assert fetched + take(digits, 60 - len(fetched)) == expected
+
+
+def test_compare_of_equal_numbers_stops_at_the_budget():
+    log2 = PrimRealNumber(log2_gen)
+    with pytest.raises(BudgetExceeded) as raised:
+        with Budget(pulls=500):
+            compare(log2, PrimRealNumber(log2_gen))
+    (x_low, x_high), (y_low, y_high) = raised.value.bounds
+    assert x_low <= y_high and y_low <= x_high
+
+
+def test_queries_answer_with_what_is_known():
+    log2 = PrimRealNumber(log2_gen)
+    with Budget(pulls=100):
+        low, high = approximate(log2, 50)
+    assert low <= 0.6931471805599453 <= high
+    with Budget(pulls=100):
+        text = format_num(log2_gen, 0)
+    assert text.startswith("[0.69")
+
+
+@pytest.mark.parametrize("budget", [Budget(bits=200), Budget(timeout=0)])
+def test_coefficient_and_time_limits(budget):
+    with pytest.raises(BudgetExceeded):
+        with budget:
+            take(log2_gen(), 100)
+
+
+def test_compare_within_budget():
+    log2 = PrimRealNumber(log2_gen)
+    with Budget(pulls=500):
+        order, ((x_low, x_high), (y_low, y_high)) = compare_within_budget(log2, PrimRealNumber(log2_gen))
+    assert order is None and x_low <= y_high and y_low <= x_high
+    half = PrimRealNumber(prim_from_fraction(fractions.Fraction(1, 2)))
+    with Budget(pulls=500):
+        assert compare_within_budget(log2, half) == (1, None)
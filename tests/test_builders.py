@@ -0,0 +1,30 @@
+import fractions
+from reals import *
+
+
+def _value(result):
+    number, exponent = result
+    low, high = approximate(number, 45)
+    return low * 2 ** exponent, high * 2 ** exponent
+
+
+def _number(frac):
+    return PrimRealNumber(prim_from_fraction(fractions.Fraction(frac)))
+
+
+def test_sum_of_numbers_and_rationals():
+    low, high = _value(sum_of([_number("1/3"), _number("-1/5"), _number("3/4"), 2, fractions.Fraction(1, 7)]))
+    expected = 1 / 3 - 1 / 5 + 3 / 4 + 2 + 1 / 7
+    assert low <= expected <= high and high - low < 1e-10
+
+
+def test_product_of_numbers_and_rationals():
+    low, high = _value(product_of([_number("1/3"), _number("-1/5"), _number("3/4"), 6]))
+    expected = 1 / 3 * -1 / 5 * 3 / 4 * 6
+    assert low <= expected <= high and high - low < 1e-10
+
+
+def test_builtins_are_not_shadowed():
+    import reals
+    assert not hasattr(reals, "sum") and not hasattr(reals, "product")
+    assert sum([1, 2]) == 3
@@ -0,0 +1,65 @@
+import fractions
+import pytest
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+COUNT = 30
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def _centered(lft):
+    lft = lft.clone()
+    lft.centered = True
+    return lft
+
+
+@pytest.mark.parametrize("transform", [
+    lambda lft: transform_unary(lft, log2_gen),
+    lambda lft: transform_unary(lft, log2_gen, COUNT),
+], ids=["exact", "bounded"])
+def test_centered_digits_of_unary_transforms(transform):
+    lft = LFTOne(1, 1, 1, 3)
+    digits, centered = take(transform(lft)(), COUNT), take(transform(_centered(lft))(), COUNT)
+    assert abs(_value(digits) - _value(centered)) <= fractions.Fraction(2, POWER_2 ** COUNT)
+
+
+@pytest.mark.parametrize("lft", [LFTTwo(1, 0, 2, 1, 1, 0, 0, 8), LFTTensor(1, 0, 2, 1, 1, 0, 0, 8)])
+def test_centered_digits_of_binary_transforms(lft):
+    streams = [log2_gen, adapted_bpp_arbitrary_base]
+    if isinstance(lft, LFTTensor):
+        digits = take(transform_tensor(lft, streams)(), COUNT)
+        centered = take(transform_tensor(_centered(lft), streams)(), COUNT)
+    else:
+        digits = take(transform_binary(lft, *streams)(), COUNT)
+        centered = take(transform_binary(_centered(lft), *streams)(), COUNT)
+    assert abs(_value(digits) - _value(centered)) <= fractions.Fraction(2, POWER_2 ** COUNT)
+
+
+def test_centered_digit_is_the_middle():
+    # the interval [1/4 - 1/POWER_2, 1/4 + 1/POWER_2] rounds to the digit of 1/4
+    assert LFTOne.digit_from_midpoint(POWER_2 // 4 - 1, POWER_2, 1, POWER_2) == POWER_2 // 4
+    assert LFTOne.digit_from_midpoint(-POWER_2 // 4 - 1, POWER_2, 1, POWER_2) == -POWER_2 // 4
+    # near the ends the digit stays in range
+    assert LFTOne.digit_from_midpoint(POWER_2, POWER_2, 1, POWER_2) == POWER_2 - 1
+
+
+@pytest.mark.parametrize("lft_class", [LFTOne, LFTTensor])
+def test_centered_lfts_extract_the_middle(lft_class):
+    # (x + POWER_2 + 1) / (4 POWER_2) is in [1/4, 1/4 + 1/(2 POWER_2)], the lower bound gives
+    # the digit above 1/4 and the middle the digit of 1/4
+    lft = lft_class(1, 0, POWER_2 + 1, 4 * POWER_2)
+    centered = _centered(lft)
+    assert lft.extract() == POWER_2 // 4 + 1
+    assert centered.extract() == POWER_2 // 4
+
+
+def test_centered_is_chosen_per_lft():
+    assert LFTOne(1, 0, 0, 2, centered=True).clone().centered
+    assert LFTTwo(0, 0, 1, 0, 1, 0, 0, 2, centered=True).clone().centered
+    tensor = LFTTensor(0, 0, 1, 0, 1, 0, 0, 2, centered=True)
+    assert tensor.clone().centered and LFTTensor.from_lft(tensor).centered
+    assert not LFTOne(1, 0, 0, 2).centered and not LFTTensor(1, 0, 0, 2).centered
@@ -0,0 +1,34 @@
+from reals import *
+from reals.streams import take
+
+
+def test_resume_continues_at_the_position(tmp_path):
+    path = str(tmp_path / "log2.ckpt")
+    expected = take(log2_gen(), 40)
+    digits = CheckpointedDigits(log2_gen(), path, 16)
+    assert take(digits, 20) == expected[:20]
+    resumed = resume(path)
+    assert resumed.position == 16
+    assert take(resumed, 24) == expected[16:]
+
+
+def test_checkpointed_readers_start_at_the_first_digit(tmp_path):
+    path = str(tmp_path / "log2")
+    expected = take(log2_gen(), 100)
+    number = PrimRealNumber(log2_gen).checkpointed(path, 16)
+    assert take(number._generator(), 50) == expected[:50]
+    # a second reader, and a number of a later run over the same files
+    assert take(number._generator(), 100) == expected
+    later = PrimRealNumber(log2_gen).checkpointed(path, 16)
+    assert take(later._generator(), 100) == expected
+
+
+def test_checkpointed_continues_from_the_saved_state(tmp_path):
+    path = str(tmp_path / "log2")
+    expected = take(log2_gen(), 60)
+    take(checkpointed(log2_gen, path, 16)(), 40)
+
+    def unusable():
+        raise AssertionError("the saved state should have been used")
+    digits = checkpointed(unusable, path, 16)()
+    assert take(digits, 60) == expected
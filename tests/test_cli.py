@@ -0,0 +1,82 @@
+import pytest
+import reals.cli
+from reals import *
+from reals.cli import main, parse_expression
+
+
+def test_compute_matches_format_hex(tmp_path):
+    path = str(tmp_path / "log2.txt")
+    assert main(["compute", "log2", "-n", "4", "-q", "-o", path]) == 0
+    with open(path) as f:
+        assert f.read().replace("\n", "")[:30] == format_hex(log2_gen, 64)[:30]
+
+
+def test_export_round_trip(tmp_path, capsys):
+    path = str(tmp_path / "log2.digits")
+    assert main(["export", "log2", "-n", "50", "--width", "16", "-o", path]) == 0
+    assert capsys.readouterr().err.strip().startswith("50 digits in")
+    packed = PackedDigits.open(path)
+    assert packed.count == 50 and packed.exponent == 16
+
+
+def test_benchmark_reports_the_requested_digits(capsys):
+    assert main(["benchmark", "log2", "-n", "200"]) == 0
+    name, digits = capsys.readouterr().out.splitlines()[1].split()[:2]
+    assert (name, digits) == ("log2", "200")
+
+
+def test_benchmark_of_no_digits(capsys):
+    assert main(["benchmark", "rational", "-n", "0"]) == 0
+    assert capsys.readouterr().out.splitlines()[1].split()[:2] == ["rational", "0"]
+
+
+def test_workers_are_rejected_for_other_expressions():
+    with pytest.raises(SystemExit):
+        main(["compute", "log2", "-n", "4", "--workers", "2"])
+    with pytest.raises(SystemExit):
+        main(["benchmark", "log2", "--workers", "2"])
+
+
+def _lfts(number):
+    if number._lft is not None:
+        yield number._lft
+        for operand in number._operands:
+            yield from _lfts(operand)
+
+
+def test_centered_applies_to_the_operations_of_the_expression():
+    expression = "mid(pi_minus_three, neg(log2)) * 1/2"
+    assert all(lft.centered for lft in _lfts(parse_expression(expression, centered=True)))
+    assert not any(lft.centered for lft in _lfts(parse_expression(expression)))
+
+
+def test_centered_digits_have_the_same_value(tmp_path):
+    texts = []
+    for centered in ([], ["--centered"]):
+        path = str(tmp_path / "mid{}.txt".format(len(texts)))
+        assert main(["compute", "mid(pi_minus_three, neg(log2))", "-n", "8", "-q", "-o", path] + centered) == 0
+        with open(path) as f:
+            texts.append(f.read().replace("\n", ""))
+    assert texts[0][:40] == texts[1][:40]
+
+
+def test_compute_long_decimal_expansions(tmp_path):
+    # more digits than Python converts between int and str at once
+    path = str(tmp_path / "seventh.txt")
+    assert main(["compute", "1/7", "-n", "500", "-f", "decimal", "-q", "-o", path]) == 0
+    with open(path) as f:
+        text = f.read().replace("\n", "")
+    assert len(text) > 4302 and text[2:] == ("142857" * 1000)[:len(text) - 2]
+
+
+def test_usage_errors_and_failures(monkeypatch):
+    with pytest.raises(SystemExit):
+        main(["compute", "2/3 * 3", "-n", "4"])
+    with pytest.raises(SystemExit):
+        main(["compute", "mid(log2)", "-n", "4"])
+
+    def failing(args):
+        raise ValueError("an internal failure")
+    monkeypatch.setattr(reals.cli, "compute", failing)
+    with pytest.raises(ValueError, match="internal"):
+        main(["compute", "log2"])
@@ -0,0 +1,34 @@
+import fractions
+import pytest
+from reals import *
+from reals.streams import take
+
+SOURCE = 24
+
+
+def _value(digits, exponent):
+    return sum(fractions.Fraction(d, 2 ** (exponent * (i + 1))) for i, d in enumerate(digits))
+
+
+@pytest.mark.parametrize("exponent", [4, 8, 12, 16, 24, 48, 64, 96])
+def test_regrouping_keeps_the_value(exponent):
+    # log2 has digits of both signs
+    source = take(log2_gen(), SOURCE)
+    count = 32 * SOURCE // exponent
+    digits = take(ConvertBaseDigits(iter(source), 2 ** 32, 2 ** exponent), count)
+    assert len(digits) == count
+    assert all(-2 ** exponent < digit < 2 ** exponent for digit in digits)
+    assert _value(digits, exponent) == _value(source, 32)
+
+
+@pytest.mark.parametrize("exponent", [12, 16, 64])
+def test_regrouping_by_take_and_next_agree(exponent):
+    digits = ConvertBaseDigits(log2_gen(), 2 ** 32, 2 ** exponent)
+    first = [next(digits) for _ in range(5)]
+    assert first + take(digits, 20) == take(ConvertBaseDigits(log2_gen(), 2 ** 32, 2 ** exponent), 25)
+
+
+def test_regrouping_there_and_back_keeps_the_value():
+    source = take(log2_gen(), SOURCE)
+    there = ConvertBaseDigits(iter(source), 2 ** 32, 2 ** 12)
+    assert _value(take(ConvertBaseDigits(there, 2 ** 12, 2 ** 32), SOURCE), 32) == _value(source, 32)
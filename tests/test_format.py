@@ -0,0 +1,9 @@
+import fractions
+from reals import *
+
+F = fractions.Fraction
+
+
+def test_format_hex_with_leading_zero():
+    # 1/32 = 0x0.08, the hex expansion starts with a zero
+    assert format_hex(prim_from_fraction(F(1, 32)), 8).startswith(" .08")
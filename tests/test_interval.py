@@ -0,0 +1,31 @@
+import fractions
+from reals import *
+
+F = fractions.Fraction
+
+
+def _number(frac):
+    return PrimRealNumber(prim_from_fraction(frac))
+
+
+def test_binary_bounds_with_distinct_operands():
+    x, y = F(1, 2), F(-1, 3)
+    # (x y + 2 y + 3 x) / 8 and y / 2, x and y enter differently
+    for lft, value in ((LFTTwo(1, 0, 2, 0, 3, 0, 0, 8), (x * y + 2 * y + 3 * x) / 8),
+                       (LFTTwo(0, 0, 1, 0, 0, 0, 0, 2), y / 2)):
+        lower, upper = float_bounds(PrimBinaryOperation(lft)(_number(x), _number(y)))
+        assert lower <= value <= upper
+        assert upper - lower < 1e-6
+
+
+def test_compare_with_distinct_operands():
+    x, y = _number(F(1, 2)), _number(F(-1, 3))
+    half_y = PrimBinaryOperation(LFTTwo(0, 0, 1, 0, 0, 0, 0, 2))(x, y)
+    assert compare(half_y, _number(F(-1, 5))) > 0
+    assert compare(half_y, _number(F(-1, 7))) < 0
+
+
+def test_approximate_encloses_the_value():
+    lower, upper = approximate(_number(F(2, 7)), 40)
+    assert lower <= F(2, 7) <= upper
+    assert upper - lower <= 2.0 ** -40
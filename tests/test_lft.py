@@ -0,0 +1,45 @@
+import random
+import pytest
+from reals import *
+
+
+def _outcome(check, lft):
+    try:
+        return check(lft)
+    except Exception as e:
+        return str(e)
+
+
+def _lft_one_by_fractions(lft):
+    if not lft.is_bounded:
+        raise Exception("Not bounded, will never be contracting")
+    bm1, bp1 = lft.bounds
+    if abs(bm1) <= 1 and abs(bp1) <= 1:
+        return True
+    if abs(bm1) > 1 and abs(bp1) > 1 and bm1 * bp1 > 0:
+        raise Exception("interval outside [-1, 1], will never be contracting")
+    return False
+
+
+def _by_fractions(lft):
+    if not lft.is_bounded:
+        return False
+    bounds = lft.bounds
+    return all(abs(bound) <= 1 for bound in bounds)
+
+
+@pytest.mark.parametrize("cls, size, by_fractions", [
+    (LFTOne, 4, _lft_one_by_fractions), (LFTTwo, 8, _by_fractions), (LFTTensor, 16, _by_fractions)])
+def test_is_contracting_matches_the_fraction_bounds(cls, size, by_fractions):
+    rng = random.Random(41)
+    for _ in range(3000):
+        lft = cls(*[rng.randint(-6, 6) for _ in range(size)])
+        assert _outcome(lambda lft: lft.is_contracting, lft) == _outcome(by_fractions, lft)
+
+
+def test_is_contracting_at_the_edge():
+    # x itself, and a little more than x
+    assert LFTOne(1, 0, 0, 1).is_contracting
+    assert not LFTOne(1001, 0, 0, 1000).is_contracting
+    assert LFTTwo(0, 0, 1, 0, 1, 0, 0, 2).is_contracting
+    assert not LFTTwo(0, 0, 1, 0, 1, 0, 1, 2).is_contracting
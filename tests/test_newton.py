@@ -0,0 +1,45 @@
+import fractions
+import math
+import pytest
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+COUNT = 40
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def _number(frac):
+    return PrimRealNumber(prim_from_fraction(fractions.Fraction(frac)))
+
+
+@pytest.mark.parametrize("frac", ["1/3", "-5/7", "1/1000", "1"])
+def test_reciprocal(frac):
+    number, exponent = reciprocal(_number(frac))
+    value = _value(take(number._generator(), COUNT)) * 2 ** exponent
+    assert abs(value - 1 / fractions.Fraction(frac)) <= fractions.Fraction(2 ** exponent, POWER_2 ** COUNT)
+
+
+def test_divide():
+    number, exponent = divide(_number("2/3"), _number("-3/5"))
+    low, high = approximate(number, 45)
+    assert low * 2 ** exponent <= -10 / 9 <= high * 2 ** exponent
+
+
+@pytest.mark.parametrize("frac", ["1/4", "1/3", "1/1000000", "1"])
+def test_sqrt(frac):
+    value = _value(take(sqrt(_number(frac))._generator(), COUNT))
+    assert abs(value * value - fractions.Fraction(frac)) <= fractions.Fraction(4, POWER_2 ** COUNT)
+
+
+def test_sqrt_of_log2():
+    low, high = approximate(sqrt(PrimRealNumber(log2_gen)), 45)
+    assert low <= math.sqrt(math.log(2)) <= high
+
+
+def test_lower_exponent():
+    assert lower_exponent(prim_from_fraction(fractions.Fraction(1, 2 ** 40))()) >= 40
+    assert 2 ** -lower_exponent(prim_from_fraction(fractions.Fraction(3, 4))()) <= 3 / 4
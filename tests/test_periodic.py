@@ -0,0 +1,69 @@
+import fractions
+import pytest
+import reals.evaluation
+import reals.scheduler
+import reals.streams
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+COUNT = 12
+# (s + c) / (c s + 1) with c = 1 - 1/D is steep at s = -1, where the first digits
+# need about 40 digits of s. mean(t, that) is just as steep in s
+D = 2 ** 1280
+STEEP = LFTOne(D, D - 1, D - 1, D)
+STEEP_MEAN = LFTTwo(D - 1, 0, D, 2 * (D - 1), D, 0, D - 1, 2 * D)
+MINUS_ONE = prim_from_fraction(fractions.Fraction(-1))
+SEVENTH = prim_from_fraction(fractions.Fraction(1, 7))
+
+
+@pytest.fixture
+def absorbed(monkeypatch):
+    """the numbers of cycles absorbed at once"""
+    counts = []
+    absorb_cycles = reals.evaluation.absorb_cycles
+
+    def counting(*args):
+        lft, count = absorb_cycles(*args)
+        counts.append(count)
+        return lft, count
+    monkeypatch.setattr(reals.streams, "absorb_cycles", counting)
+    monkeypatch.setattr(reals.scheduler, "absorb_cycles", counting)
+    return counts
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def _not_periodic(digitstream):
+    # the same digits, without telling the transforms about the cycle
+    return lambda: (digit for digit in digitstream())
+
+
+def _close(x, y):
+    # both are within POWER_2**-COUNT of the value
+    return abs(_value(x) - _value(y)) <= fractions.Fraction(2, POWER_2 ** COUNT)
+
+
+def test_absorbing_cycles_keeps_the_value_of_unary_transforms(absorbed):
+    cycles = take(transform_unary(STEEP, MINUS_ONE)(), COUNT)
+    assert any(absorbed)
+    assert _close(cycles, take(transform_unary(STEEP, _not_periodic(MINUS_ONE))(), COUNT))
+
+
+def test_absorbing_cycles_keeps_the_value_of_binary_transforms(absorbed):
+    cycles = take(transform_binary(STEEP_MEAN, SEVENTH, MINUS_ONE)(), COUNT)
+    assert any(absorbed)
+    plain = take(transform_binary(STEEP_MEAN, _not_periodic(SEVENTH), _not_periodic(MINUS_ONE))(), COUNT)
+    assert _close(cycles, plain)
+    # at s = -1 the steep part is -1
+    assert abs(_value(cycles) - (fractions.Fraction(1, 7) - 1) / 2) <= fractions.Fraction(1, POWER_2 ** COUNT)
+
+
+def test_absorbing_cycles_keeps_the_value_of_scheduled_expressions(absorbed):
+    mean = PrimBinaryOperation(STEEP_MEAN)
+    cycles = take(mean(PrimRealNumber(SEVENTH), PrimRealNumber(MINUS_ONE))._generator(), COUNT)
+    assert any(absorbed)
+    plain = mean(PrimRealNumber(_not_periodic(SEVENTH)), PrimRealNumber(_not_periodic(MINUS_ONE)))
+    assert _close(cycles, take(plain._generator(), COUNT))
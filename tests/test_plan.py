@@ -0,0 +1,29 @@
+import itertools
+import pytest
+from reals import *
+from reals.streams import plan, take
+
+
+def _one_at_a_time(digitstream, count):
+    return list(itertools.islice(digitstream(), count))
+
+
+@pytest.mark.parametrize("digitstream", [
+    adapted_bpp_arbitrary_base,
+    transform_unary(LFTOne(1, 0, 0, 2), log2_gen),
+    transform_binary(LFTTwo(0, 0, 1, 0, 1, 0, 0, 2), log2_gen, adapted_bpp_arbitrary_base),
+])
+def test_take_matches_pulling_one_digit_at_a_time(digitstream):
+    expected = _one_at_a_time(digitstream, 30)
+    assert take(digitstream(), 30) == expected
+    digits = digitstream()
+    # the surplus of a batch is kept for the digits after it
+    assert take(digits, 7) + [next(digits) for _ in range(3)] + take(digits, 20) == expected
+
+
+def test_plan_fetches_ahead():
+    expected = take(BBPDigits(), 20)
+    source = BBPDigits()
+    planned = plan(source, 16)
+    assert source.n == 16 * 8
+    assert take(planned, 20) == expected
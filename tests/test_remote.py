@@ -0,0 +1,51 @@
+import pickle
+import pytest
+from reals import *
+from reals.streams import take
+
+
+def _finite():
+    return transform_unary(LFTOne(1, 0, 0, 2), log2_gen, 5)
+
+
+@pytest.fixture
+def server():
+    with DigitServer(("127.0.0.1", 0), {"log2": log2_gen, "finite": _finite()}, batch=16) as server:
+        server.start()
+        yield server
+
+
+def test_remote_digits_match_the_local_ones(server):
+    expected = take(log2_gen(), 100)
+    number = remote_constant(server.address, "log2")
+    assert take(number._generator(), 100) == expected
+    # a second reader gets the digits the server has kept
+    digits = number._generator()
+    assert take(digits, 30) + [next(digits) for _ in range(10)] == expected[:40]
+
+
+def test_pickled_reader_continues_at_its_position(server):
+    expected = take(log2_gen(), 50)
+    digits = RemoteStream(server.address, "log2")()
+    assert take(digits, 20) == expected[:20]
+    copy = pickle.loads(pickle.dumps(digits))
+    assert take(copy, 30) == expected[20:]
+    digits.close()
+    copy.close()
+
+
+def test_remote_finite_stream_ends(server):
+    assert list(RemoteStream(server.address, "finite")()) == take(_finite()(), 5)
+
+
+def test_unknown_stream(server):
+    with pytest.raises(ValueError):
+        RemoteStream(server.address, "pi")()
+
+
+def test_reader_without_a_window(server):
+    # only the digits asked for are granted
+    expected = take(log2_gen(), 40)
+    digits = RemoteStream(server.address, "log2", batch=8, window=0)()
+    assert [next(digits)] + take(digits, 30) + [next(digits) for _ in range(9)] == expected
+    digits.close()
@@ -0,0 +1,68 @@
+import fractions
+import sys
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+mul = PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1))
+
+
+def _finite():
+    # half of log2, cut off after 5 digits
+    return transform_unary(LFTOne(1, 0, 0, 2), log2_gen, 5)
+
+
+def test_scheduled_finite_leaf_matches_nested_transforms():
+    p = PrimRealNumber(_finite())
+    nested = list(transform_binary(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1), _finite(), _finite())())
+    assert 0 < len(nested) < 20
+    assert take(mul(p, p)._generator(), 20) == nested
+    assert format_num(mul(p, p)._generator, 0) != "[-1, 1]"
+
+
+def test_scheduled_digits_of_a_finite_leaf_one_at_a_time():
+    p = PrimRealNumber(_finite())
+    digits = list(mul(p, p)._generator())
+    assert digits == take(mul(p, p)._generator(), 20)
+    assert digits
+
+
+def test_scheduled_digits_match_nested_transforms():
+    mid = LFTTwo(0, 0, 1, 0, 1, 0, 0, 2)
+    neg = LFTOne(-1, 0, 0, 1)
+    pi_minus_three, log2 = PrimRealNumber(adapted_bpp_arbitrary_base), PrimRealNumber(log2_gen)
+    scheduled = PrimBinaryOperation(mid)(pi_minus_three, PrimUnaryOperation(neg)(log2))
+    nested = transform_binary(mid, adapted_bpp_arbitrary_base, transform_unary(neg, log2_gen))
+    assert take(scheduled._generator(), 30) == take(nested(), 30)
+
+
+def test_deep_expressions_do_not_nest_frames():
+    neg = PrimUnaryOperation(LFTOne(-1, 0, 0, 1))
+    number = PrimRealNumber(prim_from_fraction(fractions.Fraction(1, 3)))
+    # every level pulls one digit ahead
+    for _ in range(300):
+        number = neg(number)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        digits = take(number._generator(), 2)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert abs(digits[0] * POWER_2 + digits[1] - POWER_2 ** 2 // 3) <= 1
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def test_scheduled_digits_with_a_precision():
+    mid = PrimBinaryOperation(LFTTwo(0, 0, 1, 0, 1, 0, 0, 2))
+    pi_minus_three, log2 = PrimRealNumber(adapted_bpp_arbitrary_base), PrimRealNumber(log2_gen)
+    # with a shared operand and an operand squared
+    number = mid(mul(log2, pi_minus_three), mul(pi_minus_three, pi_minus_three))
+    bounded, exact = ScheduledDigits(number, 200), ScheduledDigits(number)
+    digits = take(bounded, 150) + take(bounded, 100)
+    assert len(digits) == 200 and take(bounded, 1) == []
+    assert abs(_value(digits) - _value(take(exact, 200))) <= fractions.Fraction(2, POWER_2 ** 200)
+    bits = [max(abs(c) for c in node.lft._matrix).bit_length() for node in (bounded.root, exact.root)]
+    assert bits[0] < bits[1]
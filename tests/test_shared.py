@@ -0,0 +1,36 @@
+import threading
+import pytest
+from reals import *
+from reals.streams import take
+
+
+def test_readers_share_the_digits():
+    shared = SharedDigits(log2_gen)
+    first, second = shared(), shared()
+    assert take(first, 100) == take(log2_gen(), 100)
+    assert take(second, 50) + take(second, 50) == take(log2_gen(), 100)
+
+
+def test_readers_in_threads():
+    shared = SharedDigits(log2_gen)
+    results = [None] * 4
+
+    def read(i):
+        results[i] = take(shared(), 300)
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [take(log2_gen(), 300)] * 4
+
+
+def test_budgeted_reader_does_not_spoil_the_digits_of_others():
+    shared = SharedDigits(log2_gen)
+    budgeted, unbudgeted = shared(), shared()
+    with pytest.raises(BudgetExceeded):
+        with Budget(pulls=100):
+            take(budgeted, 300)
+    expected = take(log2_gen(), 300)
+    assert take(unbudgeted, 300) == expected
+    assert take(budgeted, 300) == expected
@@ -0,0 +1,75 @@
+import fractions
+import io
+from reals import *
+from reals.streams import take
+
+
+def _finite():
+    # half of log2, cut off after 5 digits
+    return transform_unary(LFTOne(1, 0, 0, 2), log2_gen, 5)
+
+
+def test_write_digits_stops_at_the_end_of_a_finite_stream():
+    out = io.BytesIO()
+    with DigitSink(out) as sink:
+        assert write_digits(_finite(), sink, PackedFormatter()) == 5
+    assert len(out.getvalue()) == 5 * 8
+    out = io.BytesIO()
+    with DigitSink(out) as sink:
+        assert write_digits(_finite(), sink, HexFormatter(), 100) == 5
+
+
+def test_hex_formatter_matches_format_hex():
+    out = io.BytesIO()
+    with DigitSink(out) as sink:
+        write_digits(log2_gen, sink, HexFormatter(line_length=0), 4)
+    text = out.getvalue().decode("ascii")
+    assert text[:30] == format_hex(log2_gen, 64)[:30]
+
+
+def test_export_round_trip():
+    out = io.BytesIO()
+    export_digits(log2_gen, out, 300, "log2")
+    packed = PackedDigits(out.getvalue())
+    assert (packed.count, packed.source) == (300, "log2")
+    assert take(from_packed(out.getvalue())._generator(), 300) == take(log2_gen(), 300)
+
+
+def test_export_of_a_finite_stream_records_the_digits_written():
+    out = io.BytesIO()
+    export_digits(_finite(), out, 100)
+    packed = PackedDigits(out.getvalue())
+    assert packed.count == 5
+    assert take(from_packed(out.getvalue())._generator(), 100) == take(_finite()(), 5)
+
+
+def _formatted(formatter, count, block=256, digitstream=log2_gen):
+    out = io.BytesIO()
+    with DigitSink(out, buffer_size=16) as sink:
+        write_digits(digitstream, sink, formatter, count, block)
+    return out.getvalue().decode("ascii")
+
+
+def test_lines_do_not_depend_on_the_blocks():
+    unwrapped = _formatted(HexFormatter(line_length=0), 12)
+    for block in (1, 2, 5, 256):
+        text = _formatted(HexFormatter(line_length=8), 12, block)
+        lines = text.split("\n")
+        assert lines[0] == " ."
+        assert all(len(line) == 8 for line in lines[1:-1]) and len(lines[-1]) < 8
+        assert "".join(lines) == unwrapped
+
+
+def test_decimal_formatter_writes_the_certain_digits():
+    assert _formatted(DecimalFormatter(line_length=0), 4).startswith(" .693147180559945309417232121458")
+    negative = transform_unary(LFTOne(-1, 0, 0, 1), log2_gen)
+    assert _formatted(DecimalFormatter(line_length=0), 2, digitstream=negative).startswith("-.69314718055")
+
+
+def test_decimal_formatter_writes_long_expansions():
+    # well beyond the 4300 digits Python converts between int and str at once
+    seventh = prim_from_fraction(fractions.Fraction(-1, 7))
+    for block in (1, 256):
+        text = _formatted(DecimalFormatter(line_length=0), 600, block, seventh)
+        assert text.startswith("-.") and len(text) > 5002
+        assert text[2:] == ("142857" * 1000)[:len(text) - 2]
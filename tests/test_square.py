@@ -0,0 +1,47 @@
+import fractions
+from reals import *
+from reals.defs import POWER_2
+from reals.streams import take
+
+COUNT = 30
+MUL = LFTTwo(1, 0, 0, 0, 0, 0, 0, 1)
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, POWER_2 ** (i + 1)) for i, d in enumerate(digits))
+
+
+def _counting(digitstream, pulled):
+    def counted():
+        for digit in digitstream():
+            pulled.append(digit)
+            yield digit
+    return counted
+
+
+def test_squaring_pulls_each_digit_once():
+    pulled_separately, pulled_once = [], []
+    x, y = _counting(log2_gen, pulled_separately), _counting(log2_gen, pulled_separately)
+    separately = take(transform_binary(MUL, x, y)(), COUNT)
+    x = _counting(log2_gen, pulled_once)
+    assert isinstance(transform_binary(MUL, x, x)(), SquareTransformDigits)
+    once = take(transform_binary(MUL, x, x)(), COUNT)
+    assert abs(_value(once) - _value(separately)) <= fractions.Fraction(2, POWER_2 ** COUNT)
+    assert len(pulled_once) < len(pulled_separately)
+
+
+def test_square_of_a_fraction_is_exact():
+    x = fractions.Fraction(-5, 7)
+    digits = take(transform_binary(MUL, prim_from_fraction(x), prim_from_fraction(x))(), COUNT)
+    assert abs(_value(digits) - x * x) <= fractions.Fraction(1, POWER_2 ** COUNT)
+
+
+def test_scheduler_aliases_the_same_operand():
+    pi_minus_three = PrimRealNumber(adapted_bpp_arbitrary_base)
+    mul = PrimBinaryOperation(MUL)
+    # the same number, and two numbers of the same constant
+    same = mul(pi_minus_three, pi_minus_three)
+    twice = mul(pi_minus_three, PrimRealNumber(adapted_bpp_arbitrary_base))
+    assert same._generator().root.aliased and twice._generator().root.aliased
+    expected = take(transform_binary(MUL, adapted_bpp_arbitrary_base, adapted_bpp_arbitrary_base)(), COUNT)
+    assert take(same._generator(), COUNT) == expected
@@ -0,0 +1,35 @@
+import array
+from reals import *
+from reals.store import digit_typecode
+from reals.streams import take
+
+
+def _unusable():
+    raise AssertionError("the digits should have been read from the store")
+
+
+def test_store_keeps_the_computed_digits(tmp_path):
+    store = DigitStore(str(tmp_path))
+    expected = take(log2_gen(), 64)
+    digits = store.stream("log2", log2_gen, flush_interval=16)()
+    assert take(digits, 64) == expected
+    digits.close()
+    kept = array.array(digit_typecode(32))
+    with open(store.path("log2"), "rb") as f:
+        kept.frombytes(f.read())
+    assert list(kept) == expected
+
+
+def test_store_is_read_instead_of_computing(tmp_path):
+    store = DigitStore(str(tmp_path))
+    expected = take(log2_gen(), 80)
+    digits = store.stream("log2", log2_gen, flush_interval=16)()
+    take(digits, 64)
+    digits.close()
+    assert take(store.stream("log2", _unusable)(), 64) == expected[:64]
+    # past the stored digits, the evaluation continues from the saved state
+    assert take(store.stream("log2", _unusable)(), 80) == expected
+
+
+def test_stores_of_different_widths_are_separate(tmp_path):
+    assert DigitStore(str(tmp_path), 16).path("log2") != DigitStore(str(tmp_path), 32).path("log2")
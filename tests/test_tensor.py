@@ -0,0 +1,46 @@
+import fractions
+import reals
+from reals import *
+from reals.scheduler import _flatten
+from reals.streams import take
+
+mid = PrimBinaryOperation(LFTTwo(0, 0, 1, 0, 1, 0, 0, 2))
+mul = PrimBinaryOperation(LFTTwo(1, 0, 0, 0, 0, 0, 0, 1))
+neg = PrimUnaryOperation(LFTOne(-1, 0, 0, 1))
+pi_minus_three = PrimRealNumber(adapted_bpp_arbitrary_base)
+log2 = PrimRealNumber(log2_gen)
+
+
+def _value(digits):
+    return sum(fractions.Fraction(d, 2 ** (32 * (i + 1))) for i, d in enumerate(digits))
+
+
+def test_tensor_of_two_arguments_matches_lft_two():
+    lft = LFTTwo(1, 0, 2, 1, 1, 0, 0, 8)
+    tensor = take(transform_tensor(LFTTensor(1, 0, 2, 1, 1, 0, 0, 8), [log2_gen, adapted_bpp_arbitrary_base])(), 20)
+    binary = take(transform_binary(lft, log2_gen, adapted_bpp_arbitrary_base)(), 20)
+    assert abs(_value(tensor) - _value(binary)) <= fractions.Fraction(2, 2 ** (32 * 20))
+
+
+def test_fused_expression_has_the_same_value():
+    number = mid(mul(pi_minus_three, log2), neg(mid(log2, pi_minus_three)))
+    fused = fuse(number)
+    assert fused._lft.arity == 4
+    expected = take(number._generator(), 20)
+    assert abs(_value(take(fused._generator(), 20)) - _value(expected)) <= fractions.Fraction(2, 2 ** (32 * 20))
+
+
+def test_fusing_keeps_shared_subexpressions_as_nodes(monkeypatch):
+    x = pi_minus_three
+    for _ in range(16):
+        x = mid(x, x)
+    calls = []
+    fuse_node = reals._fuse
+    monkeypatch.setattr(reals, "_fuse", lambda number, *args: calls.append(number) or fuse_node(number, *args))
+    fused = fuse(x)
+    # each level is fused once, not once per path to it
+    assert len(calls) <= 2 * 17
+    # one node per level, as before
+    assert len(_flatten(fused)) == len(_flatten(x))
+    expected = take(pi_minus_three._generator(), 4)
+    assert abs(_value(take(fused._generator(), 4)) - _value(expected)) <= fractions.Fraction(2, 2 ** (32 * 4))